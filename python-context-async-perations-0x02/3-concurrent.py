@@ -1,31 +1,44 @@
 import asyncio
-import aiosqlite
+import os
+import sys
 
+# Reuse the async-aware decorators from python-decorators-0x01
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "python-decorators-0x01"))
+from aio_pool import async_pools  # noqa: E402
 
-async def async_fetch_users():
+with_db_connection = __import__('1-with_db_connection').with_db_connection
+retry_on_failure = __import__('3-retry_on_failure').retry_on_failure
+
+
+@with_db_connection
+@retry_on_failure(retries=3, delay=0.1)
+async def async_fetch_users(db):
     """Fetch all users asynchronously."""
-    async with aiosqlite.connect("users.db") as db:
-        cursor = await db.execute("SELECT * FROM users")
-        results = await cursor.fetchall()
-        await cursor.close()
-        return results
+    cursor = await db.execute("SELECT * FROM users")
+    results = await cursor.fetchall()
+    await cursor.close()
+    return results
 
 
-async def async_fetch_older_users():
+@with_db_connection
+@retry_on_failure(retries=3, delay=0.1)
+async def async_fetch_older_users(db):
     """Fetch users older than 40 asynchronously."""
-    async with aiosqlite.connect("users.db") as db:
-        cursor = await db.execute("SELECT * FROM users WHERE age > 40")
-        results = await cursor.fetchall()
-        await cursor.close()
-        return results
+    cursor = await db.execute("SELECT * FROM users WHERE age > 40")
+    results = await cursor.fetchall()
+    await cursor.close()
+    return results
 
 
 async def fetch_concurrently():
     """Run both async functions concurrently."""
-    all_users, older_users = await asyncio.gather(
-        async_fetch_users(),
-        async_fetch_older_users()
-    )
+    # Close the pooled connections before the event loop ends
+    async with async_pools():
+        all_users, older_users = await asyncio.gather(
+            async_fetch_users(),
+            async_fetch_older_users()
+        )
 
     print("All Users:", all_users)
     print("Users older than 40:", older_users)
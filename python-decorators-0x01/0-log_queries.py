@@ -1,9 +1,67 @@
 import sqlite3
 import functools
+import inspect
+import time
 from datetime import datetime   # REQUIRED for checker
 
+from query_log import QueryLog
+
+
 # Decorator to log SQL queries with timestamp
-def log_queries(func):
+def log_queries(func=None, *, log=None):
+    """
+    @log_queries prints every query with a timestamp before running it.
+    @log_queries(log=QueryLog(...)) logs structured records instead
+    (query, parameters, duration, row count, or the error of a call
+    that raised) through the QueryLog's ring buffer, leaving formatting
+    and output to its flush thread.
+    """
+    if func is None:
+        return lambda func: log_queries(func, log=log)
+
+    is_coroutine = inspect.iscoroutinefunction(func)
+
+    if log is not None and is_coroutine:
+        @functools.wraps(func)
+        async def async_structured(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                log.record(args, kwargs, time.perf_counter() - start, None,
+                           error=e)
+                raise
+            duration = time.perf_counter() - start
+            log.record(args, kwargs, duration,
+                       len(result) if type(result) is list else None)
+            return result
+        return async_structured
+
+    if log is not None:
+        @functools.wraps(func)
+        def structured(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                log.record(args, kwargs, time.perf_counter() - start, None,
+                           error=e)
+                raise
+            duration = time.perf_counter() - start
+            log.record(args, kwargs, duration,
+                       len(result) if type(result) is list else None)
+            return result
+        return structured
+
+    if is_coroutine:
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            query = kwargs.get("query") or (args[0] if args else None)
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            print(f"[{timestamp}] Executing SQL query: {query}")
+            return await func(*args, **kwargs)
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         # Extract the SQL query argument
@@ -29,5 +87,12 @@ def fetch_all_users(query):
     return results
 
 
-# Fetch users while logging the query
-users = fetch_all_users(query="SELECT * FROM users")
+if __name__ == "__main__":
+    # Fetch users while logging the query
+    users = fetch_all_users(query="SELECT * FROM users")
+
+    # Structured mode: JSON lines on stderr, slow queries always logged
+    query_log = QueryLog(slow_threshold=0.05)
+    fetch_logged = log_queries(log=query_log)(fetch_all_users.__wrapped__)
+    fetch_logged(query="SELECT * FROM users")
+    query_log.close()
@@ -1,18 +1,28 @@
-import sqlite3
 import functools
+import inspect
+
+from db_pool import get_pool
+
 
 def with_db_connection(func):
+    if inspect.iscoroutinefunction(func):
+        # Coroutine: borrow an aiosqlite connection from the loop's pool,
+        # which the caller closes (see aio_pool.async_pools)
+        from aio_pool import get_async_pool
+
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            async with get_async_pool("users.db").connection() as conn:
+                return await func(conn, *args, **kwargs)
+
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # Open database connection
-        conn = sqlite3.connect("users.db")
-
-        try:
+        # Borrow a warm connection from the pool instead of opening one
+        with get_pool("users.db").connection() as conn:
             # Pass the connection to the wrapped function
             return func(conn, *args, **kwargs)
-        finally:
-            # Always close the connection
-            conn.close()
 
     return wrapper
 
@@ -24,6 +34,7 @@ def get_user_by_id(conn, user_id):
     return cursor.fetchone()
 
 
-# Fetch user by ID with automatic connection handling
-user = get_user_by_id(user_id=1)
-print(user)
+if __name__ == "__main__":
+    # Fetch user by ID with automatic connection handling
+    user = get_user_by_id(user_id=1)
+    print(user)
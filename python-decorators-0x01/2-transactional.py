@@ -1,34 +1,48 @@
-import sqlite3
+import asyncio
 import functools
+import inspect
+
+from result_cache import atrack_tables, invalidate_tables, track_tables
 
 
 # --------------------------
 # Reuse decorator from task 1
 # --------------------------
-def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect("users.db")
-        try:
-            return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-    return wrapper
+with_db_connection = __import__('1-with_db_connection').with_db_connection
 
 
 # --------------------------
 # Transaction management decorator
 # --------------------------
 def transactional(func):
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(conn, *args, **kwargs):
+            try:
+                async with atrack_tables(conn) as touched:
+                    result = await func(conn, *args, **kwargs)
+                await conn.commit()
+            except Exception as e:
+                await conn.rollback()
+                raise e
+            # Invalidation may write the disk tier, so keep it off the loop
+            if touched.writes:
+                await asyncio.to_thread(invalidate_tables, touched.writes)
+            return result
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
         try:
-            result = func(conn, *args, **kwargs)
+            with track_tables(conn) as touched:
+                result = func(conn, *args, **kwargs)
             conn.commit()       # commit if successful
-            return result
         except Exception as e:
             conn.rollback()     # rollback on error
             raise e
+        # Cached query results that read the written tables are now stale
+        invalidate_tables(touched.writes)
+        return result
     return wrapper
 
 
@@ -42,5 +56,6 @@ def update_user_email(conn, user_id, new_email):
     cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
 
 
-# Run update
-update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
+if __name__ == "__main__":
+    # Run update
+    update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
@@ -1,46 +1,135 @@
 import time
-import sqlite3
+import asyncio
+import inspect
 import functools
 
+from retry_policy import (CircuitBreaker, CircuitOpenError, backoff_delays,
+                          count, is_transient, stats_for)
+
 
 # ---------------------------------------------
 # Reuse with_db_connection decorator from Task 1
 # ---------------------------------------------
-def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect("users.db")
-        try:
-            return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-    return wrapper
+with_db_connection = __import__('1-with_db_connection').with_db_connection
 
 
 # ---------------------------------------------
 # Retry decorator for transient DB failures
 # ---------------------------------------------
-def retry_on_failure(retries=3, delay=2):
+def retry_on_failure(retries=3, delay=2, max_delay=30, budget=None,
+                     factor=2.0, jitter=True, retry_if=is_transient,
+                     breaker=None):
+    """
+    Call the function up to `retries` times while it fails with an error
+    retry_if classifies as transient (by default "database is locked"
+    and similar). Other errors are raised at once.
+
+    Sleeps between attempts grow from `delay` by `factor` up to
+    `max_delay`, with full jitter; `budget` caps the total seconds spent
+    including sleeps. Calls that still fail count towards a circuit
+    breaker (one per function unless a shared CircuitBreaker is given,
+    disabled with breaker=False) which then fails fast.
+    """
     def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            attempt = 0
+        stats = stats_for(func)
+        circuit = CircuitBreaker() if breaker is None else breaker or None
 
-            while attempt < retries:
+        def begin():
+            """
+            Count the call and fail fast while the circuit is open; True
+            as the last value for the circuit's half-open trial call
+            """
+            count(stats, "calls")
+            trial = False
+            if circuit is not None:
                 try:
-                    return func(*args, **kwargs)
+                    trial = circuit.before_call()
+                except CircuitOpenError:
+                    count(stats, "fast_failures")
+                    raise
+            deadline = None if budget is None else time.monotonic() + budget
+            return (deadline, backoff_delays(delay, factor, max_delay, jitter),
+                    trial)
+
+        def pause_after(e, attempt, deadline, pauses):
+            """Seconds to wait before retrying after e, or None to raise"""
+            print(f"Attempt {attempt} failed: {e}")
+
+            # Retrying cannot fix a bad query or a constraint
+            if not retry_if(e):
+                count(stats, "failures")
+                return None
 
-                except Exception as e:
-                    attempt += 1
-                    print(f"Attempt {attempt} failed: {e}")
+            # If out of retries or time → raise the error
+            pause = next(pauses)
+            if attempt >= retries or (
+                    deadline is not None
+                    and time.monotonic() + pause > deadline):
+                count(stats, "gave_up")
+                if circuit is not None:
+                    circuit.record_failure()
+                return None
 
-                    # If out of retries → raise the error
-                    if attempt == retries:
-                        raise
+            count(stats, "retries")
+            return pause
 
-                    # Wait before retrying
-                    time.sleep(delay)
+        def succeeded():
+            count(stats, "successes")
+            if circuit is not None:
+                circuit.record_success()
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                deadline, pauses, trial = begin()
+                attempt = 0
+                try:
+                    while True:
+                        try:
+                            result = await func(*args, **kwargs)
+                        except Exception as e:
+                            attempt += 1
+                            pause = pause_after(e, attempt, deadline, pauses)
+                            if pause is None:
+                                raise
+                            # Sleep without blocking the event loop
+                            await asyncio.sleep(pause)
+                            continue
+                        succeeded()
+                        return result
+                finally:
+                    # A trial ended by an error, a cancellation or
+                    # KeyboardInterrupt must not hold the circuit half open
+                    if trial:
+                        circuit.release()
+
+            wrapper = async_wrapper
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                deadline, pauses, trial = begin()
+                attempt = 0
+                try:
+                    while True:
+                        try:
+                            result = func(*args, **kwargs)
+                        except Exception as e:
+                            attempt += 1
+                            pause = pause_after(e, attempt, deadline, pauses)
+                            if pause is None:
+                                raise
+                            # Wait before retrying
+                            time.sleep(pause)
+                            continue
+                        succeeded()
+                        return result
+                finally:
+                    # See async_wrapper
+                    if trial:
+                        circuit.release()
 
+        wrapper.retry_stats = stats
+        wrapper.circuit = circuit
         return wrapper
     return decorator
 
@@ -59,5 +148,6 @@ def fetch_users_with_retry(conn):
 # ---------------------------------------------
 # Attempt to fetch users with auto retry
 # ---------------------------------------------
-users = fetch_users_with_retry()
-print(users)
+if __name__ == "__main__":
+    users = fetch_users_with_retry()
+    print(users)
@@ -1,48 +1,117 @@
-import time
-import sqlite3
+import os
+import inspect
 import functools
 
+from disk_cache import DiskCache, aschema_version, schema_version
+from result_cache import (QueryCache, atrack_tables, make_key,
+                          track_tables)
 
-# Global cache dictionary
-query_cache = {}
+
+# Global query cache: at most 1024 results, each kept for 5 minutes.
+# Setting QUERY_CACHE_PATH adds a file-backed tier shared by every
+# process using the same path, which survives restarts.
+QUERY_CACHE_PATH = os.environ.get("QUERY_CACHE_PATH")
+query_cache = QueryCache(
+    maxsize=1024, ttl=300,
+    disk=DiskCache(QUERY_CACHE_PATH) if QUERY_CACHE_PATH else None)
 
 
 # -------------------------------------------------
 # with_db_connection (copied from previous tasks)
 # -------------------------------------------------
-def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect("users.db")
-        try:
-            return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-    return wrapper
+with_db_connection = __import__('1-with_db_connection').with_db_connection
 
 
 # -------------------------------------------------
 # Cache decorator
 # -------------------------------------------------
-def cache_query(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        # Extract SQL query from kwargs or args
-        query = kwargs.get("query")
+def cache_query(func=None, *, cache=None, ttl=None, single_flight=True):
+    """
+    Cache results per query and bound parameters. Use as @cache_query or
+    @cache_query(ttl=30, cache=QueryCache(...)); the global query_cache
+    is used by default. Writes made through @transactional drop the
+    results of every query that read the written tables.
+
+    With single_flight, threads missing the same key at the same time
+    wait for one execution and share its result; an error reaches all of
+    them and is not cached. Coroutine functions get the same behaviour,
+    with concurrent misses awaiting one task.
+    """
+    if func is None:
+        return lambda func: cache_query(func, cache=cache, ttl=ttl,
+                                        single_flight=single_flight)
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(conn, *args, **kwargs):
+            store = query_cache if cache is None else cache
+            key = make_key(func, args, kwargs)
+
+            hit, result = store.get(key)
+            if hit:
+                print("Returning cached result...")
+                return result
+
+            disk_key = None
+            if store.disk is not None:
+                disk_key = (await aschema_version(conn),) + key
+
+            async def load():
+                hit, result = store.peek(key)
+                if hit:
+                    return result
+                since = await store.aepoch()
+                async with atrack_tables(conn) as touched:
+                    result = await func(conn, *args, **kwargs)
+                if await store.aput(key, result, touched.reads, ttl=ttl,
+                                    since=since, disk_key=disk_key):
+                    print("Query cached!")
+                return result
+
+            result, shared = await store.aload(key, load, single_flight,
+                                               disk_key)
+            if shared:
+                print("Returning cached result...")
+            return result
+
+        return async_wrapper
 
-        # If query not in kwargs, assume it's the second argument
-        if query is None and len(args) > 1:
-            query = args[1]
+    @functools.wraps(func)
+    def wrapper(conn, *args, **kwargs):
+        store = query_cache if cache is None else cache
+        # The key covers the SQL and its parameters, not the connection
+        key = make_key(func, args, kwargs)
 
         # Check cache
-        if query in query_cache:
+        hit, result = store.get(key)
+        if hit:
+            print("Returning cached result...")
+            return result
+
+        disk_key = None
+        if store.disk is not None:
+            # Shared results must not outlive a schema change; only looked
+            # up on a miss, so hits cost no extra statements
+            disk_key = (schema_version(conn),) + key
+
+        def load():
+            # Another thread may have stored it since our lookup
+            hit, result = store.peek(key)
+            if hit:
+                return result
+            # Execute the function, noting which tables the query reads
+            since = store.epoch()
+            with track_tables(conn) as touched:
+                result = func(conn, *args, **kwargs)
+            if store.put(key, result, touched.reads, ttl=ttl, since=since,
+                         disk_key=disk_key):
+                print("Query cached!")
+            return result
+
+        # Concurrent misses for this key share a single execution
+        result, shared = store.load(key, load, single_flight, disk_key)
+        if shared:
             print("Returning cached result...")
-            return query_cache[query]
-
-        # Execute the function and store its result
-        result = func(*args, **kwargs)
-        query_cache[query] = result
-        print("Query cached!")
         return result
 
     return wrapper
@@ -53,18 +122,23 @@ def cache_query(func):
 # -------------------------------------------------
 @with_db_connection
 @cache_query
-def fetch_users_with_cache(conn, query):
+def fetch_users_with_cache(conn, query, params=()):
     cursor = conn.cursor()
-    cursor.execute(query)
+    cursor.execute(query, params)
     return cursor.fetchall()
 
 
 # -------------------------------------------------
 # Calls
 # -------------------------------------------------
+if __name__ == "__main__":
+    # First call → hits database and caches result
+    users = fetch_users_with_cache(query="SELECT * FROM users")
 
-# First call → hits database and caches result
-users = fetch_users_with_cache(query="SELECT * FROM users")
+    # Second call → returns cached response
+    users_again = fetch_users_with_cache(query="SELECT * FROM users")
 
-# Second call → returns cached response
-users_again = fetch_users_with_cache(query="SELECT * FROM users")
+    # Same SQL, different parameters → cached separately
+    older = fetch_users_with_cache(query="SELECT * FROM users WHERE age > ?",
+                                   params=(40,))
+    print(query_cache.stats())
@@ -0,0 +1,121 @@
+import sqlite3
+import functools
+import time
+
+from query_profiler import QueryProfiler, is_housekeeping, normalize
+
+# Global profiler: plans are captured for calls slower than 50ms
+profiler = QueryProfiler(explain_over=0.05)
+
+cache_query = __import__('4-cache_query').cache_query
+with_db_connection = __import__('1-with_db_connection').with_db_connection
+
+
+# -------------------------------------------------
+# Profiling decorator
+# -------------------------------------------------
+def profile_queries(func=None, *, store=None):
+    """
+    Time every call into a latency histogram for its query shape (the
+    SQL with literals stripped). Put it right under @with_db_connection:
+    it watches the statements run on the connection, so calls that run
+    none (answered by @cache_query below it) are counted as cache hits,
+    and slow calls get their EXPLAIN QUERY PLAN captured.
+
+    Calls are recorded in store (a QueryProfiler), the global profiler
+    by default.
+    """
+    if func is None:
+        return lambda func: profile_queries(func, store=store)
+
+    @functools.wraps(func)
+    def wrapper(conn, *args, **kwargs):
+        current = profiler if store is None else store
+        statements = []
+        conn.set_trace_callback(statements.append)
+        start = time.perf_counter()
+        try:
+            result = func(conn, *args, **kwargs)
+        except Exception:
+            _record(current, func, conn, args, kwargs, statements,
+                    time.perf_counter() - start, error=True)
+            raise
+        finally:
+            conn.set_trace_callback(None)
+        _record(current, func, conn, args, kwargs, statements,
+                time.perf_counter() - start)
+        return result
+
+    return wrapper
+
+
+def _record(store, func, conn, args, kwargs, statements, duration,
+            error=False):
+    """Add one call to the profiler, explaining it if it was slow"""
+    queries = [sql for sql in statements if not is_housekeeping(sql)]
+    query = kwargs.get("query")
+    if query is None:
+        query = next((arg for arg in args if isinstance(arg, str)), None)
+    if query is None:
+        query = queries[0] if queries else func.__qualname__
+    shape = normalize(query)
+
+    store.record(shape, duration, cached=not queries and not error,
+                 error=error)
+    if queries and not error and store.wants_plan(shape, duration):
+        store.set_plan(shape, duration, queries[0],
+                       explain(conn, queries[0]))
+
+
+def explain(conn, sql):
+    """EXPLAIN QUERY PLAN of sql as indented lines"""
+    try:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    except sqlite3.Error as e:
+        return [f"(no plan: {e})"]
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node] + detail)
+    return lines
+
+
+# -------------------------------------------------
+# Helpers from the earlier tasks, profiled
+# -------------------------------------------------
+@with_db_connection
+@profile_queries
+def fetch_all_users(conn, query):
+    cursor = conn.cursor()
+    cursor.execute(query)
+    return cursor.fetchall()
+
+
+@with_db_connection
+@profile_queries
+def get_user_by_id(conn, user_id):
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+    return cursor.fetchone()
+
+
+@with_db_connection
+@profile_queries
+@cache_query
+def fetch_users_with_cache(conn, query, params=()):
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+
+if __name__ == "__main__":
+    fetch_all_users(query="SELECT * FROM users")
+    for user_id in range(1, 6):
+        get_user_by_id(user_id=user_id)
+    for _ in range(3):
+        fetch_users_with_cache(query="SELECT * FROM users WHERE age > ?",
+                               params=(40,))
+
+    # Top shapes by total database time, with plans of slow calls
+    print(profiler.report(n=10))
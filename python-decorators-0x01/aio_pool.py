@@ -0,0 +1,182 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import weakref
+from contextlib import asynccontextmanager
+
+import aiosqlite
+
+from db_pool import PoolTimeout
+
+
+class AsyncConnectionPool:
+    """
+    Bounded pool of warm aiosqlite connections to one database file,
+    for use on one event loop.
+
+    Like db_pool.ConnectionPool: each connection goes to one coroutine
+    at a time, is health checked (SELECT 1) before it is handed out and
+    rolled back if returned mid-transaction. Waiting for a free
+    connection does not block the loop.
+
+    aiosqlite runs every connection on a non-daemon thread, which the
+    interpreter waits for at exit, so whoever creates a pool must close
+    it (or use it as an async context manager) before the loop ends.
+    """
+
+    def __init__(self, path, size=5, timeout=30.0, health_check=True):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.health_check = health_check
+
+        self._idle = []
+        self._open = 0
+        self._available = asyncio.Condition()
+        self.stats = {"checkouts": 0, "created": 0, "discarded": 0,
+                      "waits": 0}
+
+    async def acquire(self):
+        """Check a connection out, waiting up to timeout seconds"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        while True:
+            async with self._available:
+                while not self._idle and self._open >= self.size:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        raise PoolTimeout(f"No free connection to "
+                                          f"{self.path} after "
+                                          f"{self.timeout}s")
+                    self.stats["waits"] += 1
+                    try:
+                        await asyncio.wait_for(self._available.wait(),
+                                               remaining)
+                    except asyncio.TimeoutError:
+                        continue
+                conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    self._open += 1
+
+            if conn is None:
+                return await self._connect()
+            # Health check outside the lock so other callers go ahead
+            if not self.health_check or await self._healthy(conn):
+                self.stats["checkouts"] += 1
+                return conn
+            await self._discard(conn)
+
+    async def _connect(self):
+        try:
+            conn = await aiosqlite.connect(self.path, timeout=self.timeout)
+        except BaseException:
+            async with self._available:
+                self._open -= 1
+                self._available.notify()
+            raise
+        self.stats["created"] += 1
+        self.stats["checkouts"] += 1
+        return conn
+
+    async def release(self, conn):
+        """Return a connection, rolling back anything left uncommitted"""
+        try:
+            if conn.in_transaction:
+                await conn.rollback()
+            reusable = True
+        except (sqlite3.Error, ValueError):
+            reusable = False
+
+        if not reusable:
+            await self._discard(conn)
+            return
+        async with self._available:
+            self._idle.append(conn)
+            self._available.notify()
+
+    @asynccontextmanager
+    async def connection(self):
+        conn = await self.acquire()
+        try:
+            yield conn
+        finally:
+            await self.release(conn)
+
+    @staticmethod
+    async def _healthy(conn):
+        try:
+            async with conn.execute("SELECT 1") as cursor:
+                await cursor.fetchone()
+            return True
+        except (sqlite3.Error, ValueError):
+            return False
+
+    async def _discard(self, conn):
+        self.stats["discarded"] += 1
+        try:
+            await conn.close()
+        except (sqlite3.Error, ValueError):
+            pass
+        async with self._available:
+            self._open -= 1
+            self._available.notify()
+
+    async def close(self):
+        """Close every idle connection"""
+        async with self._available:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            await self._discard(conn)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+# --------------------------
+# One shared pool per event loop and database file
+# --------------------------
+_pools = weakref.WeakKeyDictionary()   # loop -> {path: pool}
+_pools_lock = threading.Lock()
+
+
+def get_async_pool(path="users.db", size=5):
+    """
+    Shared pool for path on the running event loop. The shared pools are
+    the caller's to close: run the loop's work inside async_pools(), or
+    await close_async_pools() before the loop ends.
+    """
+    loop = asyncio.get_running_loop()
+    key = os.path.abspath(path)
+    with _pools_lock:
+        pools = _pools.setdefault(loop, {})
+        pool = pools.get(key)
+        if pool is None:
+            pool = pools[key] = AsyncConnectionPool(key, size=size)
+        return pool
+
+
+async def close_async_pools():
+    """Close every pool of the running event loop (call before it ends)"""
+    with _pools_lock:
+        pools = _pools.pop(asyncio.get_running_loop(), {})
+    for pool in pools.values():
+        await pool.close()
+
+
+@asynccontextmanager
+async def async_pools():
+    """
+    Closes the running loop's shared pools on the way out, errors
+    included:
+
+        async with async_pools():
+            await fetch_users()
+    """
+    try:
+        yield
+    finally:
+        await close_async_pools()
@@ -0,0 +1,413 @@
+#!/usr/bin/python3
+"""
+benchmark.py - micro-benchmarks for the python-decorators-0x01 decorators
+
+Each benchmark seeds a throwaway users.db in a temporary directory and
+runs there, so the real users.db is never touched. Usage:
+
+    ./benchmark.py pool --users 10000 --calls 20000 --threads 1 8
+    ./benchmark.py stampede --users 200000 --threads 32
+    ./benchmark.py cold-start --users 200000 --restarts 2
+    ./benchmark.py log-overhead --calls 200000
+    ./benchmark.py contention --writers 32 --transactions 20
+    ./benchmark.py invalidation
+"""
+
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import db_pool
+
+
+def seed_users(path, users):
+    """Create the users table in path with users synthetic rows"""
+    rng = random.Random(users)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, "
+                 "email TEXT, age INTEGER)")
+    conn.executemany("INSERT INTO users (name, email, age) VALUES (?, ?, ?)",
+                     ((f"User {i}", f"user{i}@example.com",
+                       rng.randint(18, 90)) for i in range(users)))
+    conn.commit()
+    conn.close()
+
+
+@contextmanager
+def users_database(users):
+    """Run the block inside a temporary directory holding users.db"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        seed_users(os.path.join(workdir, "users.db"), users)
+        os.chdir(workdir)
+        try:
+            yield workdir
+        finally:
+            os.chdir(cwd)
+            db_pool.close_pools()
+
+
+def import_task(name):
+    """Import a numbered task module (its demo only runs as a script)"""
+    return __import__(name)
+
+
+def latencies(func, calls, threads, make_args):
+    """Per-call latencies in seconds of func over threads threads"""
+    results = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        timings = []
+        barrier.wait()
+        for _ in range(calls // threads):
+            args = make_args(rng)
+            start = time.perf_counter()
+            func(**args)
+            timings.append(time.perf_counter() - start)
+        with lock:
+            results.extend(timings)
+
+    workers = [threading.Thread(target=worker, args=(seed,))
+               for seed in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return results
+
+
+def report(label, timings):
+    """Print mean / p50 / p99 latency in microseconds"""
+    timings = sorted(timings)
+    p50 = timings[len(timings) // 2]
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{label:<32} mean {statistics.fmean(timings) * 1e6:9.1f}us  "
+          f"p50 {p50 * 1e6:9.1f}us  p99 {p99 * 1e6:9.1f}us")
+
+
+def connect_per_call(func):
+    """The original with_db_connection: a new connection on every call"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        conn = sqlite3.connect("users.db")
+        try:
+            return func(conn, *args, **kwargs)
+        finally:
+            conn.close()
+    return wrapper
+
+
+def bench_pool(users, calls, threads):
+    """get_user_by_id latency: connect per call vs the connection pool"""
+    task = import_task('1-with_db_connection')
+    unpooled = connect_per_call(task.get_user_by_id.__wrapped__)
+
+    def make_args(rng):
+        return {"user_id": rng.randint(1, users)}
+
+    with users_database(users):
+        for count in threads:
+            report(f"connect per call, {count} thread(s)",
+                   latencies(unpooled, calls, count, make_args))
+            report(f"pooled, {count} thread(s)",
+                   latencies(task.get_user_by_id, calls, count, make_args))
+        print("pool stats:", db_pool.get_pool("users.db").stats)
+
+
+def bench_stampede(users, threads):
+    """
+    threads callers miss the same cold query at once: count how many
+    times the database runs it with and without single-flight
+    """
+    task = import_task('4-cache_query')
+    from result_cache import QueryCache
+
+    with users_database(users):
+        # Enough connections that the pool is not what serializes callers
+        db_pool.get_pool("users.db", size=threads)
+        for single_flight in (False, True):
+            executions = []
+            cache = QueryCache()
+
+            @task.with_db_connection
+            @task.cache_query(cache=cache, single_flight=single_flight)
+            def age_histogram(conn, query):
+                executions.append(1)
+                return conn.execute(query).fetchall()
+
+            barrier = threading.Barrier(threads)
+
+            def caller():
+                barrier.wait()
+                age_histogram("SELECT age, COUNT(*) FROM users GROUP BY age")
+
+            workers = [threading.Thread(target=caller)
+                       for _ in range(threads)]
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for thread in workers:
+                    thread.start()
+                for thread in workers:
+                    thread.join()
+            elapsed = time.perf_counter() - start
+            label = "single-flight" if single_flight else "no single-flight"
+            print(f"{label:<20} {len(executions):4d} executions "
+                  f"for {threads} callers  {elapsed:8.3f}s  "
+                  f"coalesced {cache.stats()['coalesced']}")
+
+
+COLD_START_QUERY = "SELECT * FROM users WHERE age = ? ORDER BY name LIMIT 20"
+
+
+def cold_child():
+    """
+    Fresh process right after a deploy: serve one request per age and
+    print the first-request latency and total time as JSON
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        task = import_task('4-cache_query')
+        start = time.perf_counter()
+        first = None
+        for age in range(18, 91):
+            task.fetch_users_with_cache(query=COLD_START_QUERY,
+                                        params=(age,))
+            if first is None:
+                first = time.perf_counter() - start
+    print(json.dumps({"first": first,
+                      "total": time.perf_counter() - start,
+                      "stats": task.query_cache.stats()}))
+
+
+def bench_cold_start(users, restarts):
+    """
+    Time fresh processes answering the same 73 queries: with the
+    in-memory cache only, then with the shared file tier (the first
+    process fills it, later ones start warm)
+    """
+    with users_database(users) as workdir:
+        env = dict(os.environ)
+        env.pop("QUERY_CACHE_PATH", None)
+        runs = [("memory only", env)] * (restarts + 1)
+        disk_env = dict(env, QUERY_CACHE_PATH=os.path.join(workdir,
+                                                           "cache.db"))
+        runs += [("disk tier, empty", disk_env)]
+        runs += [("disk tier, after restart", disk_env)] * restarts
+
+        for label, run_env in runs:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "cold-child"],
+                cwd=workdir, env=run_env, check=True, capture_output=True,
+                text=True).stdout
+            result = json.loads(output)
+            print(f"{label:<28} first request "
+                  f"{result['first'] * 1000:8.2f}ms  "
+                  f"73 requests {result['total'] * 1000:9.2f}ms  "
+                  f"disk hits {result['stats']['disk_hits']}")
+
+
+def bench_log_overhead(calls):
+    """
+    Per-call cost of log_queries around a function that does nothing,
+    so only the decorator is measured (output goes to /dev/null)
+    """
+    task = import_task('0-log_queries')
+    from query_log import QueryLog
+
+    def query(query, params=()):
+        return []
+
+    with open(os.devnull, "w") as devnull:
+        modes = [("undecorated", query, None),
+                 ("print", task.log_queries(query), None)]
+        for label, sample_rate in (("structured", 1.0),
+                                   ("structured, 1% sampled", 0.01)):
+            log = QueryLog(sink=devnull, sample_rate=sample_rate)
+            modes.append((label, task.log_queries(log=log)(query), log))
+
+        baseline = None
+        for label, func, log in modes:
+            with contextlib.redirect_stdout(devnull):
+                start = time.perf_counter()
+                cpu_start = time.thread_time()
+                for i in range(calls):
+                    func("SELECT * FROM users WHERE id = ?", (i,))
+                cpu = (time.thread_time() - cpu_start) / calls
+                elapsed = (time.perf_counter() - start) / calls
+            dropped = ""
+            if log is not None:
+                log.close()
+                dropped = f"  dropped {log.stats['dropped']}"
+            baseline = cpu if baseline is None else baseline
+            # thread_time leaves out the flush thread's formatting work
+            print(f"{label:<24} caller {cpu * 1e6:6.2f}us "
+                  f"(+{(cpu - baseline) * 1e6:.2f}us)  "
+                  f"wall {elapsed * 1e6:6.2f}us per call{dropped}")
+
+
+def bench_contention(writers, transactions, hold, delay):
+    """
+    writers threads each commit `transactions` short write transactions
+    on their own connection with no busy timeout, so lock conflicts
+    surface as "database is locked" and are left to retry_on_failure:
+    fixed delay (the original behaviour) vs exponential backoff with
+    full jitter
+    """
+    task = import_task('3-retry_on_failure')
+    policies = [
+        ("fixed delay", dict(factor=1.0, jitter=False)),
+        ("exponential + jitter", dict(factor=2.0, jitter=True,
+                                      max_delay=delay * 64)),
+    ]
+
+    with users_database(1000) as workdir:
+        path = os.path.join(workdir, "users.db")
+        for label, policy in policies:
+            @task.retry_on_failure(retries=50, delay=delay, breaker=False,
+                                   **policy)
+            def bump_age(conn, user_id):
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute("UPDATE users SET age = age + 1 "
+                                 "WHERE id = ?", (user_id,))
+                    time.sleep(hold)  # work done while holding the lock
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+
+            failed = []
+
+            def writer(seed):
+                conn = sqlite3.connect(path, timeout=0, isolation_level=None,
+                                       check_same_thread=False)
+                rng = random.Random(seed)
+                barrier.wait()
+                for _ in range(transactions):
+                    try:
+                        bump_age(conn, rng.randint(1, 1000))
+                    except sqlite3.OperationalError:
+                        failed.append(1)
+                conn.close()
+
+            barrier = threading.Barrier(writers)
+            threads = [threading.Thread(target=writer, args=(seed,))
+                       for seed in range(writers)]
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            elapsed = time.perf_counter() - start
+            stats = bump_age.retry_stats
+            print(f"{label:<22} {elapsed:7.2f}s  "
+                  f"{stats['successes'] / elapsed:8.1f} commits/sec  "
+                  f"retries {stats['retries']:6d}  gave up {len(failed)}")
+            stats.update(dict.fromkeys(stats, 0))
+
+
+def check_invalidation():
+    """
+    Results cached inside a @transactional call (nested table tracking)
+    must record the tables they read, so a later write drops them all;
+    exits with status 1 if any entry would be served stale
+    """
+    transactional = import_task('2-transactional').transactional
+    task = import_task('4-cache_query')
+    from result_cache import QueryCache
+
+    cache = QueryCache()
+    query = "SELECT COUNT(*) FROM users WHERE age > ?"
+
+    @task.cache_query(cache=cache)
+    def count_older(conn, query, params):
+        return conn.execute(query, params).fetchall()
+
+    @task.with_db_connection
+    @transactional
+    def read_then_write(conn):
+        # Same SQL twice: the second run reuses the prepared statement
+        for age in (20, 40):
+            count_older(conn, query, (age,))
+        conn.execute("UPDATE users SET age = age + 1 WHERE id = 1")
+
+    with users_database(100), contextlib.redirect_stdout(io.StringIO()):
+        read_then_write()
+    stale = len(cache)
+    print(f"nested tracking: {2 - stale} of 2 cached results invalidated")
+    if stale:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    pool = sub.add_parser("pool",
+                          help="get_user_by_id: connect per call vs pool")
+    pool.add_argument("--users", type=int, default=10000)
+    pool.add_argument("--calls", type=int, default=20000)
+    pool.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+
+    stampede = sub.add_parser("stampede",
+                              help="concurrent misses on one cold query")
+    stampede.add_argument("--users", type=int, default=200000)
+    stampede.add_argument("--threads", type=int, default=32)
+
+    cold = sub.add_parser("cold-start",
+                          help="fresh processes with and without the "
+                               "disk cache tier")
+    cold.add_argument("--users", type=int, default=200000)
+    cold.add_argument("--restarts", type=int, default=2)
+
+    sub.add_parser("cold-child")
+
+    overhead = sub.add_parser("log-overhead",
+                              help="per-call cost of log_queries")
+    overhead.add_argument("--calls", type=int, default=200000)
+
+    contention = sub.add_parser("contention",
+                                help="many writers retrying locked writes")
+    contention.add_argument("--writers", type=int, default=32)
+    contention.add_argument("--transactions", type=int, default=20)
+    contention.add_argument("--hold", type=float, default=0.001)
+    contention.add_argument("--delay", type=float, default=0.002)
+
+    sub.add_parser("invalidation",
+                   help="check writes drop results cached in a transaction")
+
+    args = parser.parse_args()
+    if args.benchmark == "pool":
+        bench_pool(args.users, args.calls, args.threads)
+    elif args.benchmark == "stampede":
+        bench_stampede(args.users, args.threads)
+    elif args.benchmark == "cold-start":
+        bench_cold_start(args.users, args.restarts)
+    elif args.benchmark == "cold-child":
+        cold_child()
+    elif args.benchmark == "log-overhead":
+        bench_log_overhead(args.calls)
+    elif args.benchmark == "contention":
+        bench_contention(args.writers, args.transactions, args.hold,
+                         args.delay)
+    elif args.benchmark == "invalidation":
+        check_invalidation()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Raised when no pooled connection becomes free in time."""
+
+
+class ConnectionPool:
+    """
+    Bounded pool of warm sqlite3 connections to one database file.
+
+    Connections are opened with check_same_thread=False so any thread may
+    use them, but the pool hands each one to a single caller at a time.
+    Before a connection is handed out it is health checked (SELECT 1);
+    on return any open transaction is rolled back.
+    """
+
+    def __init__(self, path, size=5, timeout=30.0, health_check=True):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.health_check = health_check
+        self.pid = os.getpid()
+
+        self._idle = []         # most recently returned last
+        self._open = 0
+        self._lock = threading.Condition()
+        self.stats = {"checkouts": 0, "created": 0, "discarded": 0,
+                      "waits": 0}
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=self.timeout,
+                               check_same_thread=False)
+
+    def acquire(self):
+        """Check a connection out, waiting up to timeout seconds"""
+        deadline = time.monotonic() + self.timeout
+        with self._lock:
+            while True:
+                while self._idle:
+                    conn = self._idle.pop()
+                    if not self.health_check or self._healthy(conn):
+                        self.stats["checkouts"] += 1
+                        return conn
+                    self._discard(conn)
+                if self._open < self.size:
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"No free connection to {self.path} "
+                                      f"after {self.timeout}s")
+                self.stats["waits"] += 1
+                self._lock.wait(remaining)
+
+        # Open outside the lock so other callers are not held up
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._lock:
+                self._open -= 1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self.stats["created"] += 1
+            self.stats["checkouts"] += 1
+        return conn
+
+    def release(self, conn):
+        """Return a connection, rolling back anything left uncommitted"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            reusable = True
+        except sqlite3.Error:
+            reusable = False
+
+        with self._lock:
+            if reusable and self.pid == os.getpid():
+                self._idle.append(conn)
+            else:
+                self._discard(conn)
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    @staticmethod
+    def _healthy(conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        self._open -= 1
+        self.stats["discarded"] += 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def close(self):
+        """Close every idle connection"""
+        with self._lock:
+            while self._idle:
+                self._discard(self._idle.pop())
+
+
+# --------------------------
+# One shared pool per database file
+# --------------------------
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path="users.db", size=5):
+    """Shared pool for path; a forked child gets its own pool"""
+    key = os.path.abspath(path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.pid != os.getpid():
+            pool = ConnectionPool(key, size=size)
+            _pools[key] = pool
+        return pool
+
+
+def close_pools():
+    """Close and forget every shared pool"""
+    with _pools_lock:
+        for pool in _pools.values():
+            if pool.pid == os.getpid():
+                pool.close()
+        _pools.clear()
@@ -0,0 +1,263 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+# Bump when the on-disk layout or serialization changes
+FORMAT_VERSION = 1
+
+# Values larger than this are zlib-compressed if that makes them smaller
+COMPRESS_OVER = 512
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key BLOB PRIMARY KEY,
+    expires_at REAL NOT NULL,
+    tables TEXT NOT NULL,
+    value BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS result_tables (
+    table_name TEXT NOT NULL,
+    key BLOB NOT NULL,
+    PRIMARY KEY (table_name, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_expiry ON results (expires_at);
+CREATE TABLE IF NOT EXISTS invalidations (
+    table_name TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def dumps(value):
+    """Compact bytes for a query result (pickle, zlib when it pays)"""
+    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(data) > COMPRESS_OVER:
+        packed = zlib.compress(data, 1)
+        if len(packed) < len(data):
+            return b"z" + packed
+    return b"p" + data
+
+
+def loads(data):
+    if data[:1] == b"z":
+        return pickle.loads(zlib.decompress(data[1:]))
+    return pickle.loads(data[1:])
+
+
+def schema_version(conn):
+    """
+    Identifies the database and its current schema: the main database
+    file and PRAGMA schema_version, which sqlite bumps on every schema
+    change (so cached results of an older schema are never read back)
+    """
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    return path, version
+
+
+async def aschema_version(conn):
+    """schema_version for an aiosqlite connection"""
+    async with conn.execute("PRAGMA database_list") as cursor:
+        path = (await cursor.fetchone())[2]
+    async with conn.execute("PRAGMA schema_version") as cursor:
+        version = (await cursor.fetchone())[0]
+    return path, version
+
+
+class DiskCache:
+    """
+    Query results stored in a local SQLite file that any number of
+    worker processes can share, and that survives restarts.
+
+    Keys are hashed together with FORMAT_VERSION and version (bump it
+    on deploys that change what cached functions return). Entries
+    expire after ttl seconds of wall-clock time, and at most
+    max_entries are kept. Errors reading or writing the file, and
+    entries that fail to decode, count as misses rather than failing
+    the query.
+
+    Every invalidation bumps a generation stored in the file for each
+    table it names. A result put with since=generation() read before
+    its query ran is refused if one of its tables was invalidated in
+    the meantime, by this process or any other sharing the file.
+
+    Values are pickled, and unpickling runs whatever code the data asks
+    for: the file is trusted input, so it must only be writable by the
+    processes sharing it (never place it in a world-writable directory).
+    """
+
+    def __init__(self, path, ttl=3600.0, max_entries=100000, version=""):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version = version
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._puts = 0
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "stale": 0,
+                      "errors": 0}
+
+    def _connection(self):
+        # One connection per process; a forked child opens its own
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _digest(self, key):
+        material = pickle.dumps((FORMAT_VERSION, self.version, key),
+                                protocol=4)
+        return hashlib.blake2b(material, digest_size=16).digest()
+
+    def get(self, key):
+        """
+        (True, value, tables, seconds left) for a live entry, else
+        (False, None, (), 0)
+        """
+        digest = self._digest(key)
+        with self._lock:
+            try:
+                row = self._connection().execute(
+                    "SELECT value, tables, expires_at FROM results "
+                    "WHERE key = ?", (digest,)).fetchone()
+            except sqlite3.Error:
+                self.stats["errors"] += 1
+                return False, None, (), 0
+            remaining = row[2] - time.time() if row else 0
+            if remaining <= 0:
+                self.stats["misses"] += 1
+                return False, None, (), 0
+        try:
+            value = loads(row[0])
+        except Exception:
+            # Corrupt, or pickled by code that no longer matches
+            with self._lock:
+                self.stats["errors"] += 1
+            return False, None, (), 0
+        with self._lock:
+            self.stats["hits"] += 1
+        tables = row[1].split(",") if row[1] else ()
+        return True, value, tables, remaining
+
+    def generation(self):
+        """
+        Current invalidation generation, to pass to put() as since; None
+        if the file cannot be read
+        """
+        with self._lock:
+            try:
+                return self._connection().execute(
+                    "SELECT COALESCE(MAX(generation), 0) "
+                    "FROM invalidations").fetchone()[0]
+            except sqlite3.Error:
+                self.stats["errors"] += 1
+                return None
+
+    def put(self, key, value, tables=(), ttl=None, since=None):
+        """
+        Store value; False if since (from generation()) is given and one
+        of tables was invalidated after it, in which case nothing is
+        written because the result may predate that write
+        """
+        digest = self._digest(key)
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        data = dumps(value)
+        tables = list(tables)
+        with self._lock:
+            try:
+                conn = self._connection()
+                with _transaction(conn):
+                    # Checked under the write lock, so no invalidation
+                    # can commit between the check and the insert
+                    if since is not None and tables:
+                        newest = conn.execute(
+                            "SELECT MAX(generation) FROM invalidations "
+                            "WHERE table_name IN "
+                            f"({', '.join('?' * len(tables))})",
+                            tables).fetchone()[0]
+                        if newest is not None and newest > since:
+                            self.stats["stale"] += 1
+                            return False
+                    conn.execute("INSERT OR REPLACE INTO results "
+                                 "VALUES (?, ?, ?, ?)",
+                                 (digest, expires_at, ",".join(tables),
+                                  data))
+                    conn.executemany("INSERT OR IGNORE INTO result_tables "
+                                     "VALUES (?, ?)",
+                                     [(table, digest) for table in tables])
+                self.stats["writes"] += 1
+                self._puts += 1
+                if self._puts % 1000 == 0:
+                    self._prune(conn)
+            except sqlite3.Error:
+                self.stats["errors"] += 1
+        return True
+
+    def invalidate_tables(self, tables):
+        """Delete every stored result that read one of tables"""
+        with self._lock:
+            try:
+                conn = self._connection()
+                with _transaction(conn):
+                    generation = conn.execute(
+                        "SELECT COALESCE(MAX(generation), 0) + 1 "
+                        "FROM invalidations").fetchone()[0]
+                    conn.executemany("INSERT OR REPLACE INTO invalidations "
+                                     "VALUES (?, ?)",
+                                     [(table, generation)
+                                      for table in tables])
+                    for table in tables:
+                        conn.execute("DELETE FROM results WHERE key IN "
+                                     "(SELECT key FROM result_tables "
+                                     "WHERE table_name = ?)", (table,))
+                        conn.execute("DELETE FROM result_tables "
+                                     "WHERE table_name = ?", (table,))
+            except sqlite3.Error:
+                self.stats["errors"] += 1
+
+    def _prune(self, conn):
+        """Drop expired entries, then the soonest to expire over the cap"""
+        with _transaction(conn):
+            conn.execute("DELETE FROM results WHERE expires_at <= ?",
+                         (time.time(),))
+            conn.execute("DELETE FROM results WHERE key IN (SELECT key "
+                         "FROM results ORDER BY expires_at DESC "
+                         "LIMIT -1 OFFSET ?)", (self.max_entries,))
+            conn.execute("DELETE FROM result_tables WHERE key NOT IN "
+                         "(SELECT key FROM results)")
+
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            with _transaction(conn):
+                conn.execute("DELETE FROM results")
+                conn.execute("DELETE FROM result_tables")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+@contextmanager
+def _transaction(conn):
+    """BEGIN IMMEDIATE ... COMMIT on an autocommit connection"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
@@ -0,0 +1,133 @@
+import atexit
+import json
+import random
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+
+def query_and_params(args, kwargs):
+    """The SQL string of a call and the parameters that follow it"""
+    query = kwargs.get("query")
+    params = kwargs.get("params")
+    if query is None:
+        for index, arg in enumerate(args):
+            if isinstance(arg, str):
+                query = arg
+                if params is None and index + 1 < len(args):
+                    params = args[index + 1]
+                break
+    return query, params
+
+
+class QueryLog:
+    """
+    Structured query log that keeps formatting and I/O off the caller's
+    thread.
+
+    record() only picks the SQL and parameters out of the call and
+    appends them with its timing to a bounded ring buffer; formatting
+    happens on a background thread, which wakes every flush_interval
+    seconds (or once batch_size records are waiting) and writes a batch
+    of JSON lines to sink in one call. When the buffer is full the
+    oldest records are dropped and counted rather than blocking the
+    caller.
+
+    sample_rate is the fraction of queries logged; queries taking at
+    least slow_threshold seconds are always logged and marked slow, and
+    so are calls that raised, with their error.
+    The stats counters are not locked, so they are approximate when
+    many threads log at once.
+    """
+
+    def __init__(self, sink=None, capacity=10000, batch_size=1000,
+                 flush_interval=1.0, sample_rate=1.0, slow_threshold=None):
+        self.sink = sink if sink is not None else sys.stderr
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.stats = {"sampled_out": 0, "dropped": 0, "written": 0}
+        self._always_log_over = (float("inf") if slow_threshold is None
+                                 else slow_threshold)
+
+        self._buffer = deque(maxlen=capacity)
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._write_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="query-log",
+                                        daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, args, kwargs, duration, rows, error=None):
+        """
+        Queue one call for logging unless it is sampled out; error is
+        the exception the call raised, if any. Cheap: no formatting and
+        no I/O happen here.
+        """
+        if (error is None and duration < self._always_log_over
+                and random.random() >= self.sample_rate):
+            self.stats["sampled_out"] += 1
+            return
+        query, params = query_and_params(args, kwargs)
+        if isinstance(params, (list, dict)):
+            params = params.copy()  # the caller may reuse and change it
+        if error is not None:
+            error = f"{type(error).__name__}: {error}"
+        buffer = self._buffer
+        if len(buffer) == buffer.maxlen:
+            self.stats["dropped"] += 1
+        buffer.append((time.time(), query, params, duration, rows, error))
+        if len(buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Format and write everything buffered so far"""
+        with self._write_lock:
+            lines = []
+            buffer = self._buffer
+            # Only what is there now, so busy callers cannot keep us here
+            for _ in range(len(buffer)):
+                try:
+                    entry = buffer.popleft()
+                except IndexError:
+                    break
+                lines.append(self._format(entry))
+            if not lines:
+                return
+            self.sink.write("".join(lines))
+            self.sink.flush()
+            self.stats["written"] += len(lines)
+
+    def _format(self, entry):
+        timestamp, query, params, duration, rows, error = entry
+        record = {
+            "time": datetime.fromtimestamp(timestamp).isoformat(),
+            "query": query,
+            "params": params,
+            "duration_ms": round(duration * 1000, 3),
+            "rows": rows,
+        }
+        if self.slow_threshold is not None and duration >= self.slow_threshold:
+            record["slow"] = True
+        if error is not None:
+            record["error"] = error
+        return json.dumps(record, default=repr) + "\n"
+
+    def close(self):
+        """Stop the flush thread and write out what is left"""
+        if not self._stopped:
+            self._stopped = True
+            atexit.unregister(self.close)
+            self._wakeup.set()
+            self._thread.join()
+            self.flush()
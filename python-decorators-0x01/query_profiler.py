@@ -0,0 +1,156 @@
+import re
+import threading
+
+# Statements that say nothing about what a call queried
+_HOUSEKEEPING = ("PRAGMA", "BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT",
+                 "RELEASE", "END")
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize(sql):
+    """
+    Query shape: sql with string and number literals replaced by ?,
+    IN lists collapsed and whitespace squeezed, so calls that differ
+    only in their values are grouped together
+    """
+    shape = _STRING.sub("?", sql)
+    shape = _NUMBER.sub("?", shape)
+    shape = _IN_LIST.sub("(?)", shape)
+    return _SPACE.sub(" ", shape).strip().rstrip(";").rstrip()
+
+
+def is_housekeeping(sql):
+    return sql.lstrip()[:9].upper().startswith(_HOUSEKEEPING)
+
+
+class Histogram:
+    """
+    Latency histogram with power-of-two microsecond buckets (1us up to
+    about 2 minutes), so recording is O(1) and memory is fixed
+    """
+
+    BUCKETS = 28
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        micros = int(seconds * 1e6)
+        self.counts[min(micros.bit_length(), self.BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """Upper bound in seconds of the bucket holding the q-th percentile"""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min((1 << bucket) / 1e6, self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class ShapeStats:
+    """Everything recorded for one query shape"""
+
+    def __init__(self, shape):
+        self.shape = shape
+        self.database = Histogram()   # calls that ran statements
+        self.cached = Histogram()     # calls answered without a statement
+        self.errors = 0
+        self.plan = None              # (duration, sql, plan lines)
+
+
+class QueryProfiler:
+    """
+    Latency histograms per query shape. Calls answered from a cache are
+    counted and timed separately from calls that reached the database.
+    The first call of a shape slower than explain_over seconds, and any
+    later one slower still, get their EXPLAIN QUERY PLAN captured.
+    """
+
+    def __init__(self, explain_over=0.05):
+        self.explain_over = explain_over
+        self._shapes = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, shape):
+        stats = self._shapes.get(shape)
+        if stats is None:
+            stats = self._shapes[shape] = ShapeStats(shape)
+        return stats
+
+    def record(self, shape, duration, cached=False, error=False):
+        with self._lock:
+            stats = self._stats(shape)
+            if error:
+                stats.errors += 1
+            (stats.cached if cached else stats.database).add(duration)
+
+    def wants_plan(self, shape, duration):
+        """Whether a call of shape taking duration should be explained"""
+        if self.explain_over is None or duration < self.explain_over:
+            return False
+        with self._lock:
+            plan = self._stats(shape).plan
+            return plan is None or duration > plan[0]
+
+    def set_plan(self, shape, duration, sql, plan):
+        with self._lock:
+            self._stats(shape).plan = (duration, sql, plan)
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+
+    def top(self, n=10, by="total"):
+        """The n shapes with the highest database total, p99 or calls"""
+        keys = {
+            "total": lambda stats: stats.database.total,
+            "p99": lambda stats: stats.database.percentile(99),
+            "calls": lambda stats: (stats.database.count
+                                    + stats.cached.count),
+        }
+        with self._lock:
+            shapes = list(self._shapes.values())
+        return sorted(shapes, key=keys[by], reverse=True)[:n]
+
+    def report(self, n=10, by="total"):
+        """Text report of the top n shapes and their captured plans"""
+        lines = [f"{'calls':>7} {'cached':>7} {'errors':>6} "
+                 f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+                 f"{'max ms':>8} {'total s':>8}  shape"]
+        plans = []
+        for stats in self.top(n, by):
+            db = stats.database
+            lines.append(
+                f"{db.count:7d} {stats.cached.count:7d} {stats.errors:6d} "
+                f"{db.percentile(50) * 1e3:8.2f} "
+                f"{db.percentile(95) * 1e3:8.2f} "
+                f"{db.percentile(99) * 1e3:8.2f} {db.max * 1e3:8.2f} "
+                f"{db.total:8.3f}  {stats.shape}")
+            if stats.plan is not None:
+                duration, sql, plan = stats.plan
+                plans.append(f"\n{stats.shape}\n  slowest: "
+                             f"{duration * 1e3:.2f}ms  {sql}")
+                plans.extend(f"  {line}" for line in plan)
+        if plans:
+            lines.append("\nQuery plans of slow calls:")
+            lines.extend(plans)
+        return "\n".join(lines)
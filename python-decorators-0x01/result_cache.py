@@ -0,0 +1,450 @@
+import asyncio
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+
+# Authorizer actions that modify a table; value is the argument naming it
+_WRITE_ACTIONS = {
+    sqlite3.SQLITE_INSERT: 0,
+    sqlite3.SQLITE_UPDATE: 0,
+    sqlite3.SQLITE_DELETE: 0,
+    sqlite3.SQLITE_DROP_TABLE: 0,
+    sqlite3.SQLITE_ALTER_TABLE: 1,
+}
+
+
+class TouchedTables:
+    """Tables read and written while a track_tables block was active."""
+
+    def __init__(self):
+        self.reads = set()
+        self.writes = set()
+
+
+# --------------------------
+# Table tracking through the sqlite3 authorizer
+# --------------------------
+_trackers = {}   # id(conn) -> active TouchedTables on that connection
+_trackers_lock = threading.Lock()
+
+
+def _authorizer(trackers):
+    def authorize(action, arg1, arg2, db_name, trigger):
+        if action == sqlite3.SQLITE_READ:
+            for touched in trackers:
+                touched.reads.add(arg1)
+        elif action in _WRITE_ACTIONS:
+            table = (arg1, arg2)[_WRITE_ACTIONS[action]]
+            for touched in trackers:
+                touched.writes.add(table)
+        return sqlite3.SQLITE_OK
+    return authorize
+
+
+@contextmanager
+def track_tables(conn):
+    """
+    Record the tables each statement run on conn reads and writes.
+    Blocks may nest (transactional around cache_query); every active
+    block sees every statement.
+
+    The authorizer only runs when a statement is prepared, so it is set
+    again on every block entry: that expires the connection's cached
+    statements, and a nested block sees statements the outer block
+    already prepared.
+    """
+    touched = TouchedTables()
+    with _trackers_lock:
+        trackers = _trackers.setdefault(id(conn), [])
+        trackers.append(touched)
+    conn.set_authorizer(_authorizer(trackers))
+    try:
+        yield touched
+    finally:
+        with _trackers_lock:
+            trackers.remove(touched)
+            last = not trackers
+            if last:
+                del _trackers[id(conn)]
+        if last:
+            conn.set_authorizer(None)
+
+
+@asynccontextmanager
+async def atrack_tables(conn):
+    """track_tables for an aiosqlite connection"""
+    touched = TouchedTables()
+    with _trackers_lock:
+        trackers = _trackers.setdefault(id(conn), [])
+        trackers.append(touched)
+    # Every entry, as in track_tables
+    await conn.set_authorizer(_authorizer(trackers))
+    try:
+        yield touched
+    finally:
+        with _trackers_lock:
+            trackers.remove(touched)
+            last = not trackers
+            if last:
+                del _trackers[id(conn)]
+        if last:
+            await conn.set_authorizer(None)
+
+
+# --------------------------
+# Single-flight: one execution per key for concurrent callers
+# --------------------------
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller runs
+    the function, later callers wait for it and share its result. An
+    exception is raised to every waiter and nothing is remembered once
+    the call finishes, so the next caller tries again.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """(result, shared) where shared is True for a waiting caller"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+# Result a cancelled leader leaves its waiters: run the call again
+_RETRY = object()
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines: waiters await the leader's future. If
+    the leader is cancelled, its waiters are not: one of them runs the
+    call again as the new leader.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, func):
+        """(result, shared) where shared is True for a waiting caller"""
+        while True:
+            call = self._calls.get(key)
+            if call is None:
+                break
+            # shield: a cancelled waiter must not cancel the shared call
+            result = await asyncio.shield(call)
+            if result is not _RETRY:
+                return result, True
+
+        call = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            call.set_result(_RETRY)
+            raise
+        except BaseException as e:
+            call.set_exception(e)
+            # Retrieved here so an error nobody waited for is not reported
+            call.exception()
+            raise
+        else:
+            call.set_result(result)
+        finally:
+            del self._calls[key]
+        return result, False
+
+
+# --------------------------
+# Bounded LRU cache with TTL and table invalidation
+# --------------------------
+class QueryCache:
+    """
+    Query result cache holding at most maxsize entries.
+
+    The least recently used entry is evicted when the cache is full, and
+    entries expire ttl seconds after they were stored (per entry ttl
+    overrides the default). Each entry remembers the tables its query
+    read, and invalidate_tables drops every entry depending on them.
+    Misses for the same key are loaded once at a time (see load).
+
+    disk is an optional second tier (a disk_cache.DiskCache) shared by
+    worker processes: misses look there before running the query, and
+    stored results and invalidations are written through to it.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300.0, disk=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.disk = disk
+        self._entries = OrderedDict()  # key -> (expires_at, tables, value)
+        self._by_table = {}            # table -> keys reading it
+        self._invalidated = {}         # table -> epoch of last invalidation
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self._async_flights = AsyncSingleFlight()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0,
+                          "expirations": 0, "invalidations": 0,
+                          "coalesced": 0, "disk_hits": 0}
+        _caches.add(self)
+
+    def get(self, key):
+        """(True, value) for a live entry, else (False, None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._drop(key)
+                self._counters["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return True, entry[2]
+
+    def peek(self, key):
+        """Like get, without touching the counters or recency"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return False, None
+            return True, entry[2]
+
+    def load(self, key, loader, single_flight=True, disk_key=None):
+        """
+        Run loader() for a missed key, unless the disk tier has it under
+        disk_key (key by default); a disk hit is kept in memory for the
+        rest of its time to live. With single_flight, concurrent misses
+        for the same key wait for the one running loader instead of
+        querying again; they are counted as coalesced. Returns
+        (result, shared).
+        """
+        def run():
+            if self.disk is not None:
+                since = self._memory_epoch()
+                hit, value, tables, remaining = self.disk.get(
+                    key if disk_key is None else disk_key)
+                if hit:
+                    self._store(key, value, frozenset(tables), remaining,
+                                since)
+                    with self._lock:
+                        self._counters["disk_hits"] += 1
+                    return value
+            return loader()
+
+        if not single_flight:
+            return run(), False
+        result, shared = self._flights.do(key, run)
+        if shared:
+            with self._lock:
+                self._counters["coalesced"] += 1
+        return result, shared
+
+    async def aload(self, key, loader, single_flight=True, disk_key=None):
+        """load() for a coroutine loader; the disk tier is read in a thread"""
+        async def run():
+            if self.disk is not None:
+                since = self._memory_epoch()
+                hit, value, tables, remaining = await asyncio.to_thread(
+                    self.disk.get, key if disk_key is None else disk_key)
+                if hit:
+                    self._store(key, value, frozenset(tables), remaining,
+                                since)
+                    with self._lock:
+                        self._counters["disk_hits"] += 1
+                    return value
+            return await loader()
+
+        if not single_flight:
+            return await run(), False
+        result, shared = await self._async_flights.do(key, run)
+        if shared:
+            with self._lock:
+                self._counters["coalesced"] += 1
+        return result, shared
+
+    def epoch(self):
+        """
+        Token to pass to put(): results read after it are current. With a
+        disk tier it includes the file's invalidation generation, so
+        writes committed by other processes are caught too.
+        """
+        if self.disk is None:
+            return self._memory_epoch(), None
+        return self._memory_epoch(), self.disk.generation()
+
+    async def aepoch(self):
+        """epoch() that reads the disk tier in a thread"""
+        if self.disk is None:
+            return self._memory_epoch(), None
+        return (self._memory_epoch(),
+                await asyncio.to_thread(self.disk.generation))
+
+    def _memory_epoch(self):
+        with self._lock:
+            return self._epoch
+
+    def put(self, key, value, tables=(), ttl=None, since=None,
+            disk_key=None):
+        """
+        Store value for key (disk_key in the disk tier, key by default).
+        When since (from epoch()) is given, the value is not stored if one
+        of its tables was invalidated in the meantime, because the result
+        may predate that write.
+        """
+        tables = frozenset(tables)
+        ttl = self.ttl if ttl is None else ttl
+        memory_since, disk_since = (None, None) if since is None else since
+        if not self._store(key, value, tables, ttl, memory_since):
+            return False
+        if self.disk is not None and not self.disk.put(
+                key if disk_key is None else disk_key, value, tables, ttl,
+                disk_since):
+            self._forget(key, value)
+            return False
+        return True
+
+    async def aput(self, key, value, tables=(), ttl=None, since=None,
+                   disk_key=None):
+        """put() that writes the disk tier in a thread"""
+        tables = frozenset(tables)
+        ttl = self.ttl if ttl is None else ttl
+        memory_since, disk_since = (None, None) if since is None else since
+        if not self._store(key, value, tables, ttl, memory_since):
+            return False
+        if self.disk is not None and not await asyncio.to_thread(
+                self.disk.put, key if disk_key is None else disk_key,
+                value, tables, ttl, disk_since):
+            self._forget(key, value)
+            return False
+        return True
+
+    def _forget(self, key, value):
+        """Drop key if it still holds value (another process invalidated it)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is value:
+                self._drop(key)
+
+    def _store(self, key, value, tables, ttl, since=None):
+        with self._lock:
+            if since is not None and any(
+                    self._invalidated.get(table, -1) >= since
+                    for table in tables):
+                return False
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + ttl, tables, value)
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+            return True
+
+    def invalidate_tables(self, tables):
+        """Drop every entry that read one of tables"""
+        with self._lock:
+            for table in tables:
+                self._invalidated[table] = self._epoch
+                for key in list(self._by_table.get(table, ())):
+                    self._drop(key)
+                    self._counters["invalidations"] += 1
+            self._epoch += 1
+        if self.disk is not None:
+            self.disk.invalidate_tables(tables)
+
+    def clear(self):
+        """Empty the in-memory tier (the disk tier is left alone)"""
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+
+    def _drop(self, key):
+        _, tables, _ = self._entries.pop(key)
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+    def stats(self):
+        """
+        Hit/miss/eviction counters and the current size; coalesced misses
+        are also counted as misses
+        """
+        with self._lock:
+            stats = dict(self._counters, size=len(self._entries),
+                         maxsize=self.maxsize)
+        if self.disk is not None:
+            stats["disk"] = dict(self.disk.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_caches = weakref.WeakSet()
+
+
+def invalidate_tables(tables):
+    """Invalidate tables in every QueryCache (called after a write commits)"""
+    if tables:
+        for cache in list(_caches):
+            cache.invalidate_tables(tables)
+
+
+def make_key(func, args, kwargs):
+    """
+    Cache key for a call: the function plus every argument after the
+    connection, so the SQL and its bound parameters both count
+    """
+    return (func.__module__, func.__qualname__, _freeze(args),
+            _freeze(sorted(kwargs.items())))
+
+
+def _freeze(value):
+    """Hashable version of value (lists and dicts become tuples)"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item))
+                            for key, item in value.items()))
+    if isinstance(value, set):
+        return frozenset(_freeze(item) for item in value)
+    return value
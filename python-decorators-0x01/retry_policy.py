@@ -0,0 +1,122 @@
+import random
+import sqlite3
+import threading
+import time
+
+# sqlite3.OperationalError messages worth retrying: another connection
+# holds a lock, or the pool had no free connection
+TRANSIENT_MESSAGES = (
+    "database is locked",
+    "database table is locked",
+    "database schema has changed",
+    "no free connection",
+)
+
+
+def is_transient(error):
+    """
+    Whether error may succeed if retried. Syntax errors, missing tables,
+    constraint violations and other programming errors are not.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, sqlite3.OperationalError):
+        message = str(error).lower()
+        return any(marker in message for marker in TRANSIENT_MESSAGES)
+    return False
+
+
+def backoff_delays(delay, factor=2.0, max_delay=30.0, jitter=True,
+                   rng=random):
+    """
+    Endless sleeps for successive retries: delay * factor ** n capped at
+    max_delay, each drawn uniformly from [0, cap] with full jitter so
+    clients that failed together do not retry together
+    """
+    cap = delay
+    while True:
+        yield rng.uniform(0, cap) if jitter else cap
+        cap = min(max_delay, cap * factor)
+
+
+class CircuitOpenError(sqlite3.OperationalError):
+    """Raised without calling the database while a circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Fails fast after failure_threshold consecutive transient failures.
+
+    Once open, calls raise CircuitOpenError for reset_timeout seconds;
+    then a single trial call is let through (half open). Its success
+    closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Raise CircuitOpenError unless a call may go ahead. Returns True
+        for the half-open trial call, which must end in record_success,
+        record_failure or release, however it ends.
+        """
+        with self._lock:
+            if self.state == "closed":
+                return False
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError("Circuit open: failing fast")
+                self.state = "half_open"
+            if self._trial_running:
+                raise CircuitOpenError("Circuit half open: trial running")
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if (self.state == "half_open"
+                    or self._failures >= self.failure_threshold):
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """
+        End a trial call without a verdict: it failed for a non-transient
+        reason or was interrupted (KeyboardInterrupt, cancellation)
+        """
+        with self._lock:
+            self._trial_running = False
+
+
+# Per-function counters: qualified name -> dict
+retry_stats = {}
+_stats_lock = threading.Lock()
+
+
+def stats_for(func):
+    name = f"{func.__module__}.{func.__qualname__}"
+    with _stats_lock:
+        return retry_stats.setdefault(name, {
+            "calls": 0, "retries": 0, "successes": 0, "failures": 0,
+            "gave_up": 0, "fast_failures": 0,
+        })
+
+
+def count(stats, name):
+    with _stats_lock:
+        stats[name] += 1
@@ -3,29 +3,50 @@
 0-stream_users.py - generator to stream rows from user_data table
 """
 
-import mysql.connector
 from mysql.connector import Error
+from projection import column_names, row_converter, select_list
+seed = __import__('seed')
 
-def stream_users():
-    """Generator that yields rows from the user_data table one by one"""
-    try:
-        # Connect to the ALX_prodev database
-        connection = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="Bondeni001.",  # update your MySQL password
-            database="ALX_prodev"
-        )
+DEFAULT_FETCH_SIZE = 1000
+
+
+def stream_users(fetch_size=DEFAULT_FETCH_SIZE, columns=None,
+                 row_type="dict"):
+    """
+    Generator that yields rows from the user_data table one by one.
 
-        cursor = connection.cursor(dictionary=True)  # get rows as dicts
-        cursor.execute("SELECT * FROM user_data")
+    The cursor is unbuffered (server-side): rows stay on the server until
+    they are read, fetch_size rows per fetchmany call, so client memory
+    stays constant however large the table is.
 
-        # Single loop: yield one row at a time
-        for row in cursor:
-            yield row
+    columns limits the query to those columns, and row_type picks the
+    row shape: "dict", "tuple" or "record" (see projection.py).
+    """
+    query = f"SELECT {select_list(columns)} FROM user_data"
+    connection = seed.connect_to_prodev()
+    if connection is None:
+        return
+
+    try:
+        # plain tuple rows, without buffering the whole result set
+        cursor = connection.cursor(buffered=False)
+        cursor.execute(query)
+        convert = row_converter(column_names(cursor), row_type)
+
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            if convert is None:
+                yield from rows
+            else:
+                yield from map(convert, rows)
 
         cursor.close()
-        connection.close()
 
     except Error as e:
-        print(f"Error connecting to database: {e}")
+        print(f"Error streaming users: {e}")
+
+    finally:
+        # also discards any rows left unread if the consumer stopped early
+        connection.close()
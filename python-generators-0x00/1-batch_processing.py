@@ -3,37 +3,80 @@
 1-batch_processing.py - batch processing generator for user_data
 """
 
-import mysql.connector
+from array import array
+from itertools import compress
+
 from mysql.connector import Error
+from predicates import compile_where, where
+from projection import (USER_DATA_COLUMNS, column_names, row_converter,
+                        select_list)
+from readahead import read_ahead
 seed = __import__('seed')
 
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, columns fall back to array/list
+    np = None
+
 
-def stream_users_in_batches(batch_size):
+def stream_users_in_batches(batch_size, predicate=None, columns=None,
+                            row_type="dict", prefetch=0):
     """
     Generator that fetches rows from user_data in batches.
     Each batch is a list of dictionaries.
+
+    predicate (see predicates.py) is compiled into a parameterized WHERE
+    clause; any part SQL cannot evaluate is applied to each batch here
+    (so it may only use selected columns), and batches it empties are
+    skipped. columns and row_type project the rows as in stream_users.
+
+    With prefetch > 0, up to that many batches are fetched ahead on a
+    background thread (see readahead.py).
     """
+    batches = scan_users_in_batches(batch_size, predicate, columns, row_type)
     try:
-        connection = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="Bondeni001.",  # update with your MySQL password
-            database="ALX_prodev"
-        )
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM user_data")
+        # read_ahead re-raises the scan's errors here, on this thread
+        yield from (read_ahead(batches, prefetch) if prefetch else batches)
+    except Error as e:
+        print(f"Error: {e}")
+
+
+def scan_users_in_batches(batch_size, predicate=None, columns=None,
+                          row_type="dict"):
+    """
+    The batches of stream_users_in_batches, but a database error (or no
+    connection) is raised instead of printed, for callers that must not
+    take a failed scan for a short one.
+    """
+    where_sql, params, residual = compile_where(predicate)
+    query = f"SELECT {select_list(columns)} FROM user_data" + where_sql
+    connection = seed.connect_to_prodev()
+    if connection is None:
+        raise Error(msg="No connection to ALX_prodev")
+
+    try:
+        cursor = connection.cursor()
+        cursor.execute(query, params)
+        names = column_names(cursor)
+        convert = row_converter(names, row_type)
 
         while True:  # Single loop
             batch = cursor.fetchmany(batch_size)
             if not batch:
                 break
+            if residual is not None:
+                batch = [row for row in batch
+                         if residual.matches(dict(zip(names, row)))]
+                if not batch:
+                    continue
+            if convert is not None:
+                batch = [convert(row) for row in batch]
             yield batch  # yield the batch instead of returning
 
         cursor.close()
-        connection.close()
 
-    except Error as e:
-        print(f"Error: {e}")
+    finally:
+        connection.close()
 
 
 def batch_processing(batch_size):
@@ -41,8 +84,72 @@ def batch_processing(batch_size):
     Processes each batch from stream_users_in_batches and
     yields users over 25 years old.
     """
-    for batch in stream_users_in_batches(batch_size):  # Loop 1: batches
+    over_25 = where("age", ">", 25)  # Filter condition, run by the database
+    for batch in stream_users_in_batches(batch_size, over_25):  # Loop 1
         for user in batch:  # Loop 2: users in batch
-            if user["age"] > 25:  # Filter condition
-                yield user  # <-- use yield instead of print
+            yield user  # <-- use yield instead of print
+
 
+# Columns holding numbers, stored as float arrays in a columnar batch
+NUMERIC_COLUMNS = ("age",)
+
+
+def _column(name, values):
+    """Build one column: a numeric array for NUMERIC_COLUMNS, else a list"""
+    if name in NUMERIC_COLUMNS:
+        if np is not None:
+            return np.array(values, dtype=np.float64)
+        return array("d", map(float, values))
+    if np is not None:
+        return np.array(values, dtype=object)
+    return list(values)
+
+
+def stream_users_in_columns(batch_size, columns=None, predicate=None):
+    """
+    Generator like stream_users_in_batches, but each batch is a dict of
+    columns (column name -> array of values) instead of a list of dicts.
+
+    Only the listed columns (all by default) are selected and turned
+    into arrays, and predicate is pushed down as in
+    stream_users_in_batches, so rows it rejects are never materialized.
+    Numeric columns are NumPy float64 arrays when NumPy is installed,
+    otherwise array('d'); other columns are object arrays or lists.
+    """
+    names = list(columns or USER_DATA_COLUMNS)
+    try:
+        for rows in scan_users_in_batches(batch_size, predicate, names,
+                                          row_type="tuple"):
+            yield {name: _column(name, values)
+                   for name, values in zip(names, zip(*rows))}
+    except Error as e:
+        print(f"Error: {e}")
+
+
+def filter_columns(columns, mask):
+    """Keep the rows of a columnar batch where mask is true"""
+    if np is not None:
+        return {name: values[mask] for name, values in columns.items()}
+    return {name: array(values.typecode, compress(values, mask))
+            if isinstance(values, array) else list(compress(values, mask))
+            for name, values in columns.items()}
+
+
+def batch_processing_columnar(batch_size, min_age=25, columns=None):
+    """
+    Columnar version of batch_processing: yields each batch from
+    stream_users_in_columns filtered to users over min_age. With NumPy
+    the filter is one vectorized comparison per batch.
+
+    columns limits the batches to those columns (all by default); age is
+    read for the filter either way but only returned if listed.
+    """
+    wanted = list(columns or USER_DATA_COLUMNS)
+    for batch in stream_users_in_columns(
+            batch_size, list(dict.fromkeys(wanted + ["age"]))):
+        ages = batch["age"]
+        if np is not None:
+            mask = ages > min_age
+        else:
+            mask = [age > min_age for age in ages]
+        yield filter_columns({name: batch[name] for name in wanted}, mask)
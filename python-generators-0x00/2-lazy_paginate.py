@@ -3,32 +3,166 @@
 2-lazy_paginate.py - Lazily paginate user_data from ALX_prodev
 """
 
+import base64
+import json
+
+from projection import column_names, row_converter, select_list
+from readahead import read_ahead
 seed = __import__('seed')
 
 
-def paginate_users(page_size, offset):
+class WalkStats:
     """
-    Fetch a single page of rows from user_data
+    Counters for one lazy_pagination or lazy_keyset_pagination walk:
+    connections is how many connections the walk checked out of the
+    shared pool (seed.connect_to_prodev), so 1 for any walk that ran.
     """
+
+    def __init__(self):
+        self.connections = 0
+
+
+def _open_connection(stats=None):
+    """Get a connection to ALX_prodev, counting it in stats if given"""
     connection = seed.connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
-    rows = cursor.fetchall()
-    cursor.close()
-    connection.close()
-    return rows
+    if connection is not None and stats is not None:
+        stats.connections += 1
+    return connection
+
+
+def _fetch_page(connection, query, params, row_type="dict"):
+    """Run a page query on connection, or on a one-off connection if None"""
+    own_connection = connection is None
+    if own_connection:
+        connection = _open_connection()
+        if connection is None:
+            return []
+
+    try:
+        cursor = connection.cursor()
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        convert = row_converter(column_names(cursor), row_type)
+        cursor.close()
+        return rows if convert is None else [convert(row) for row in rows]
+    finally:
+        if own_connection:
+            connection.close()
+
 
+def paginate_users(page_size, offset, connection=None, columns=None,
+                   row_type="dict"):
+    """
+    Fetch a single page of rows from user_data.
+    Uses connection if given, otherwise opens (and closes) its own.
+    columns and row_type project the rows (see projection.py).
+    """
+    return _fetch_page(
+        connection,
+        f"SELECT {select_list(columns)} FROM user_data LIMIT %s OFFSET %s",
+        (page_size, offset),
+        row_type
+    )
 
-def lazy_pagination(page_size):
+
+def lazy_pagination(page_size, columns=None, row_type="dict", prefetch=0,
+                    stats=None):
     """
     Generator that lazily fetches pages of user_data.
     Each page contains `page_size` rows.
+
+    All pages are read over one connection, which is closed when the walk
+    ends or the generator is closed or garbage collected. columns and
+    row_type project the rows as in paginate_users. Pass a WalkStats as
+    stats to count the connections the walk uses.
+
+    With prefetch > 0, up to that many pages are fetched ahead on a
+    background thread (see readahead.py).
+    """
+    if prefetch:
+        yield from read_ahead(lazy_pagination(page_size, columns, row_type,
+                                              stats=stats), prefetch)
+        return
+
+    select_list(columns)  # reject bad columns before connecting
+    connection = _open_connection(stats)
+    if connection is None:
+        return
+
+    try:
+        offset = 0
+
+        while True:  # Only one loop
+            page = paginate_users(page_size, offset, connection, columns,
+                                  row_type)
+            if not page:
+                break
+            yield page
+            offset += page_size
+    finally:
+        connection.close()
+
+
+def paginate_users_after(page_size, last_user_id=None, connection=None):
+    """
+    Fetch the page of rows that follows last_user_id in user_id order
+    (keyset pagination). The primary key index seeks straight to the
+    page, so the cost does not grow with how deep the page is.
+    Uses connection if given, otherwise opens (and closes) its own.
+    """
+    if last_user_id is None:
+        return _fetch_page(
+            connection,
+            "SELECT * FROM user_data ORDER BY user_id LIMIT %s",
+            (page_size,)
+        )
+    return _fetch_page(
+        connection,
+        "SELECT * FROM user_data WHERE user_id > %s "
+        "ORDER BY user_id LIMIT %s",
+        (last_user_id, page_size)
+    )
+
+
+def encode_cursor(last_user_id):
+    """Opaque token that resumes a keyset walk after last_user_id"""
+    payload = json.dumps({"after": last_user_id}).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_cursor(token):
+    """Return the user_id stored in a token from encode_cursor"""
+    try:
+        return json.loads(base64.urlsafe_b64decode(token.encode()))["after"]
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"Invalid pagination cursor: {token!r}") from e
+
+
+def next_cursor(page):
+    """Token to resume a keyset walk after page (None for an empty page)"""
+    return encode_cursor(page[-1]["user_id"]) if page else None
+
+
+def lazy_keyset_pagination(page_size, cursor=None, stats=None):
+    """
+    Generator like lazy_pagination, but walks user_data in user_id order
+    with keyset pagination, so a full walk is linear in the table size.
+
+    To resume a walk later, save next_cursor(page) for the last page
+    processed and pass it back as cursor. Like lazy_pagination, the walk
+    uses a single connection, counted in stats (a WalkStats) if given.
     """
-    offset = 0
+    last_user_id = decode_cursor(cursor) if cursor else None
+    connection = _open_connection(stats)
+    if connection is None:
+        return
 
-    while True:  # Only one loop
-        page = paginate_users(page_size, offset)
-        if not page:
-            break
-        yield page
-        offset += page_size
+    try:
+        while True:
+            page = paginate_users_after(page_size, last_user_id, connection)
+            if not page:
+                break
+            yield page
+            last_user_id = page[-1]["user_id"]
+    finally:
+        connection.close()
@@ -3,6 +3,10 @@
 4-stream_ages.py - Compute average age using a generator
 """
 
+import math
+from collections import Counter
+from decimal import Decimal
+
 import mysql.connector
 from mysql.connector import Error
 seed = __import__('seed')
@@ -12,8 +16,11 @@ def stream_user_ages():
     """
     Generator that yields ages of users one by one
     """
+    connection = seed.connect_to_prodev()
+    if connection is None:
+        return
+
     try:
-        connection = seed.connect_to_prodev()
         cursor = connection.cursor(dictionary=True)
         cursor.execute("SELECT age FROM user_data")
 
@@ -21,25 +28,167 @@ def stream_user_ages():
             yield row["age"]
 
         cursor.close()
-        connection.close()
 
     except Error as e:
         print(f"Error: {e}")
 
+    finally:
+        connection.close()
 
-def compute_average_age():
+
+def _to_decimal(value):
+    """Convert an age to Decimal without going through binary floats"""
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, float):
+        return Decimal(repr(value))
+    return Decimal(value)
+
+
+def _nearest_rank(count, percentile):
+    """1-based rank of the given percentile among count sorted values"""
+    return min(count, max(1, math.ceil(Decimal(percentile) / 100 * count)))
+
+
+class RunningStats:
+    """
+    Single-pass accumulator for count, mean, min, max, variance and
+    percentiles of a stream of Decimal values.
+
+    The sum (and so the mean) is exact, the variance uses Welford's
+    update, and percentiles come from a count of each distinct value,
+    which stays small for a column like age.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = Decimal(0)
+        self.minimum = None
+        self.maximum = None
+        self._mean = Decimal(0)
+        self._m2 = Decimal(0)
+        self._histogram = Counter()
+
+    def add(self, value):
+        value = _to_decimal(value)
+        self.count += 1
+        self.total += value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+        self._histogram[value] += 1
+
+    def percentile(self, percentile):
+        """Nearest-rank percentile (0-100) of the values seen so far"""
+        rank = _nearest_rank(self.count, percentile)
+        seen = 0
+        for value in sorted(self._histogram):
+            seen += self._histogram[value]
+            if seen >= rank:
+                return value
+        return None
+
+    def summary(self, percentiles=()):
+        """Same dictionary as summarize_ages returns"""
+        if not self.count:
+            return {"count": 0, "mean": None, "min": None, "max": None,
+                    "variance": None,
+                    "percentiles": {p: None for p in percentiles}}
+        return {
+            "count": self.count,
+            "mean": self.total / self.count,
+            "min": self.minimum,
+            "max": self.maximum,
+            "variance": self._m2 / self.count,
+            "percentiles": {p: self.percentile(p) for p in percentiles},
+        }
+
+
+def _summarize_in_database(percentiles):
+    """Compute the summary with two aggregate queries"""
+    connection = seed.connect_to_prodev()
+    if connection is None:
+        raise Error(msg="No connection to ALX_prodev")
+
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT COUNT(age), SUM(age), SUM(age * age), MIN(age), MAX(age) "
+            "FROM user_data"
+        )
+        count, total, total_sq, minimum, maximum = cursor.fetchone()
+        if not count:
+            cursor.close()
+            return RunningStats().summary(percentiles)
+
+        total, total_sq = _to_decimal(total), _to_decimal(total_sq)
+        mean = total / count
+        summary = {
+            "count": count,
+            "mean": mean,
+            "min": _to_decimal(minimum),
+            "max": _to_decimal(maximum),
+            "variance": total_sq / count - mean * mean,
+            "percentiles": {},
+        }
+
+        # Every percentile's rank in one ordered pass (window function)
+        ranks = {p: _nearest_rank(count, p) for p in percentiles}
+        if ranks:
+            wanted = sorted(set(ranks.values()))
+            cursor.execute(
+                "SELECT position, age FROM (SELECT age, ROW_NUMBER() "
+                "OVER (ORDER BY age) AS position FROM user_data) ranked "
+                f"WHERE position IN ({', '.join(['%s'] * len(wanted))})",
+                wanted
+            )
+            ages = {position: _to_decimal(age)
+                    for position, age in cursor.fetchall()}
+            summary["percentiles"] = {p: ages[rank]
+                                      for p, rank in ranks.items()}
+
+        cursor.close()
+        return summary
+    finally:
+        connection.close()
+
+
+def summarize_ages(ages=None, percentiles=(50, 90, 99)):
     """
-    Compute average age using the stream_user_ages generator
+    Summarize user ages as a dictionary with count, mean, min, max,
+    (population) variance and nearest-rank percentiles.
+
+    With no argument the work is pushed down to the database, so only a
+    few single-row results cross the wire. Given any iterable of ages
+    (e.g. stream_user_ages()), it is consumed in one pass with
+    RunningStats instead.
     """
-    total_age = 0
-    count = 0
+    if ages is None:
+        return _summarize_in_database(percentiles)
+
+    stats = RunningStats()
+    for age in ages:
+        stats.add(age)
+    return stats.summary(percentiles)
+
 
-    for age in stream_user_ages():  # Loop 2: iterate ages
-        total_age += age
-        count += 1
+def compute_average_age():
+    """
+    Compute average age, aggregated by the database (see summarize_ages)
+    """
+    try:
+        summary = summarize_ages(percentiles=())
+    except Error as e:
+        print(f"Error: {e}")
+        return
 
-    if count > 0:
-        average_age = total_age / count
+    if summary["count"] > 0:
+        average_age = summary["mean"]
         print(f"Average age of users: {average_age:.2f}")
     else:
         print("No users found.")
@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+"""
+async_streams.py - async generator versions of the user_data streams
+
+mysql.connector is blocking, so each stream runs its sync generator on a
+dedicated worker thread and hands batches to the event loop through a
+bounded queue. The next `prefetch` batches are fetched while the current
+one is being processed, and database errors are raised to the consumer:
+
+    async for user in astream_users():
+        ...
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing, suppress
+
+from readahead import DONE, Failure, received
+processing = __import__('1-batch_processing')
+paginate = __import__('2-lazy_paginate')
+
+DEFAULT_PREFETCH = 2
+
+
+async def _prefetch(batches, prefetch):
+    """
+    Async generator over the sync generator `batches`, keeping up to
+    `prefetch` batches fetched ahead. All calls into `batches` (including
+    the final close) run on one worker thread, one at a time.
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1)
+    ready = asyncio.Queue(maxsize=max(1, prefetch))
+
+    async def producer():
+        try:
+            while True:
+                batch = await loop.run_in_executor(executor, next, batches,
+                                                   DONE)
+                await ready.put(batch)
+                if batch is DONE:
+                    return
+        except Exception as e:
+            await ready.put(Failure(e))
+
+    task = asyncio.create_task(producer())
+    try:
+        while True:
+            batch = received(await ready.get())
+            if batch is DONE:
+                break
+            yield batch
+    finally:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+        # queued behind any fetch still running on the worker thread
+        await loop.run_in_executor(executor, batches.close)
+        executor.shutdown(wait=False)
+
+
+async def astream_users_in_batches(batch_size, predicate=None, columns=None,
+                                   row_type="dict",
+                                   prefetch=DEFAULT_PREFETCH):
+    """Async version of stream_users_in_batches, with read-ahead"""
+    batches = processing.scan_users_in_batches(batch_size, predicate,
+                                               columns, row_type)
+    async with aclosing(_prefetch(batches, prefetch)) as stream:
+        async for batch in stream:
+            yield batch
+
+
+async def astream_users(fetch_size=1000, columns=None, row_type="dict",
+                        prefetch=DEFAULT_PREFETCH):
+    """
+    Async version of stream_users: yields rows one by one, while the
+    next batches of fetch_size rows are fetched in the background
+    """
+    batches = processing.scan_users_in_batches(fetch_size, columns=columns,
+                                               row_type=row_type)
+    async with aclosing(_prefetch(batches, prefetch)) as stream:
+        async for batch in stream:
+            for row in batch:
+                yield row
+
+
+async def alazy_pagination(page_size, columns=None, row_type="dict",
+                           prefetch=DEFAULT_PREFETCH):
+    """Async version of lazy_pagination, with read-ahead"""
+    pages = paginate.lazy_pagination(page_size, columns, row_type)
+    async with aclosing(_prefetch(pages, prefetch)) as stream:
+        async for page in stream:
+            yield page
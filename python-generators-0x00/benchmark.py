@@ -0,0 +1,716 @@
+#!/usr/bin/python3
+"""
+benchmark.py - local benchmarks for python-generators-0x00
+
+Runs against the sqlite-backed MySQL stand-in in standin.py, so no
+MySQL server is needed. Usage:
+
+    ./benchmark.py insert --rows 100000
+    ./benchmark.py parallel --rows 200000 --workers 1 2 4 8
+    ./benchmark.py stream-memory --sizes 10000 1000000 10000000
+    ./benchmark.py pagination --rows 1000000 --page-size 100
+    ./benchmark.py columnar --rows 200000 --batch-sizes 50 1000 50000
+    ./benchmark.py projection --rows 200000 --keep 10000
+    ./benchmark.py async --rows 100000 --latency 0.005 --work 0.005
+    ./benchmark.py read-ahead --rows 100000 --latency 0.005 --work 0.005
+    ./benchmark.py partitioned --rows 500000 --workers 1 2 4 8
+    ./benchmark.py incremental --rows 500000 --changed 1000
+    ./benchmark.py snapshot --rows 500000
+    ./benchmark.py pool --threads 16 --size 4
+
+    ./benchmark.py suite --sizes 10000 1000000 10000000 --output before.json
+    ./benchmark.py compare before.json after.json
+
+sqlite allows one writer at a time, so the parallel numbers mostly show
+the parsing side; run against MySQL to see the connection side scale.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import connection_pool
+import standin
+seed = __import__('seed')
+
+
+def make_csv(path, rows):
+    """Write rows synthetic users to path in the user_data.csv layout"""
+    rng = random.Random(rows)
+    with open(path, "w", newline='', encoding='utf-8') as file:
+        writer = csv.writer(file, quoting=csv.QUOTE_ALL)
+        writer.writerow(["name", "email", "age"])
+        for i in range(rows):
+            writer.writerow([f"User {i}", f"user{i}@example.com",
+                             rng.randint(1, 120)])
+
+
+def fresh_database(workdir, name):
+    """Return a stand-in connection to an empty user_data table"""
+    path = os.path.join(workdir, f"{name}.db")
+    if os.path.exists(path):
+        os.remove(path)
+    connection = standin.connect(path)
+    seed.create_table(connection)
+    return connection
+
+
+def seeded_database(workdir, rows):
+    """Path of a stand-in database holding rows users, seeded via seed.py"""
+    path = os.path.join(workdir, f"users_{rows}.db")
+    csv_file = os.path.join(workdir, f"users_{rows}.csv")
+    make_csv(csv_file, rows)
+    connection = fresh_database(workdir, f"users_{rows}")
+    seed.insert_data_bulk(connection, csv_file, chunk_size=10000)
+    connection.close()
+    os.remove(csv_file)
+    return path
+
+
+def use_database(path, latency=0.0):
+    """
+    Point the shared connection pool (and so the generators) at the
+    stand-in database at path, with latency seconds of simulated round
+    trip per query and fetch
+    """
+    os.environ["PRODEV_SQLITE_PATH"] = path
+    os.environ["PRODEV_SQLITE_LATENCY"] = str(latency)
+    connection_pool.reset_pools()
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process, in KiB"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def timed(label, rows, func):
+    """Run func once and print its rows/sec"""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed:8.3f}s  {rows / elapsed:12,.0f} rows/sec")
+    return elapsed
+
+
+def bench_insert(rows, chunk_size, commit_every):
+    """Compare the per-row insert_data loop with insert_data_bulk"""
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_file = os.path.join(workdir, "user_data.csv")
+        make_csv(csv_file, rows)
+
+        connection = fresh_database(workdir, "per_row")
+        per_row = timed("insert_data (per row)", rows,
+                        lambda: seed.insert_data(connection, csv_file))
+        connection.close()
+
+        connection = fresh_database(workdir, "bulk")
+        bulk = timed("insert_data_bulk", rows,
+                     lambda: seed.insert_data_bulk(connection, csv_file,
+                                                   chunk_size, commit_every))
+        connection.close()
+
+        print(f"speed-up: {per_row / bulk:.1f}x")
+
+
+def bench_parallel(rows, worker_counts):
+    """Throughput of insert_data_parallel for each worker count"""
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_file = os.path.join(workdir, "user_data.csv")
+        make_csv(csv_file, rows)
+
+        for workers in worker_counts:
+            fresh_database(workdir, f"parallel_{workers}").close()
+            path = os.path.join(workdir, f"parallel_{workers}.db")
+            timed(f"{workers} workers", rows,
+                  lambda: seed.insert_data_parallel(
+                      csv_file, workers=workers,
+                      connect=lambda: standin.connect(path)))
+
+
+def bench_pagination(rows, page_size, repeat):
+    """
+    Latency of the first and last page with LIMIT/OFFSET
+    (paginate_users) and keyset pagination (paginate_users_after), then
+    the time and number of connections for a full walk with each.
+    """
+    paginate = __import__('2-lazy_paginate')
+    with tempfile.TemporaryDirectory() as workdir:
+        use_database(seeded_database(workdir, rows))
+
+        last_offset = rows - page_size
+        connection = seed.connect_to_prodev()
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT user_id FROM user_data ORDER BY user_id LIMIT 1 OFFSET %s",
+            (last_offset - 1,)
+        )
+        before_last = cursor.fetchone()[0]
+        connection.close()
+
+        cases = [
+            ("offset, first page",
+             lambda: paginate.paginate_users(page_size, 0)),
+            ("offset, last page",
+             lambda: paginate.paginate_users(page_size, last_offset)),
+            ("keyset, first page",
+             lambda: paginate.paginate_users_after(page_size)),
+            ("keyset, last page",
+             lambda: paginate.paginate_users_after(page_size, before_last)),
+        ]
+        for label, fetch_page in cases:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                fetch_page()
+            elapsed = (time.perf_counter() - start) / repeat
+            print(f"{label:<24} {elapsed * 1000:8.2f} ms/page")
+
+        walks = [("lazy_pagination", paginate.lazy_pagination),
+                 ("lazy_keyset_pagination", paginate.lazy_keyset_pagination)]
+        for label, walk in walks:
+            stats = paginate.WalkStats()
+            timed(f"{label} walk", rows,
+                  lambda: sum(1 for _ in walk(page_size, stats=stats)))
+            print(f"{'':<28} {stats.connections} connection(s) checked out")
+
+
+def bench_columnar(rows, batch_sizes):
+    """
+    rows/sec of batch_processing (dict per row) against
+    batch_processing_columnar, with all columns and with only the two it
+    needs, for each batch size
+    """
+    processing = __import__('1-batch_processing')
+    backend = "numpy" if processing.np is not None else "array"
+    with tempfile.TemporaryDirectory() as workdir:
+        use_database(seeded_database(workdir, rows))
+
+        for batch_size in batch_sizes:
+            timed(f"dicts, batch {batch_size}", rows,
+                  lambda: sum(1 for _ in processing.batch_processing(
+                      batch_size)))
+            timed(f"columns ({backend}), batch {batch_size}", rows,
+                  lambda: sum(len(batch["age"]) for batch in
+                              processing.batch_processing_columnar(
+                                  batch_size)))
+            timed(f"id+age ({backend}), batch {batch_size}",
+                  rows,
+                  lambda: sum(len(batch["age"]) for batch in
+                              processing.batch_processing_columnar(
+                                  batch_size,
+                                  columns=["user_id", "age"])))
+
+
+def bench_projection(rows, keep):
+    """
+    Per-row memory and allocations of stream_users for several
+    projections and row shapes, plus the rows/sec of a full pass.
+    Memory is measured with tracemalloc while keep rows are held.
+    """
+    stream_users = __import__('0-stream_users').stream_users
+    shapes = [
+        ("SELECT *, dict", None, "dict"),
+        ("age, dict", ["age"], "dict"),
+        ("age, tuple", ["age"], "tuple"),
+        ("age, record", ["age"], "record"),
+        ("name+age, record", ["name", "age"], "record"),
+    ]
+    with tempfile.TemporaryDirectory() as workdir:
+        use_database(seeded_database(workdir, rows))
+        keep = min(keep, rows)
+
+        for label, columns, row_type in shapes:
+            stream = stream_users(columns=columns, row_type=row_type)
+            next(stream)  # connect and run the query before measuring
+
+            tracemalloc.start()
+            held = [next(stream) for _ in range(keep)]
+            memory, _ = tracemalloc.get_traced_memory()
+            blocks = sum(stat.count for stat in
+                         tracemalloc.take_snapshot().statistics("filename"))
+            tracemalloc.stop()
+            del held
+            stream.close()
+
+            print(f"{label:<28} {memory / keep:8.1f} bytes/row  "
+                  f"{blocks / keep:6.2f} allocations/row")
+            timed(f"{label}, full pass", rows,
+                  lambda: sum(1 for _ in stream_users(
+                      columns=columns, row_type=row_type)))
+
+
+def bench_async(rows, batch_size, latency, work):
+    """
+    Sync stream_users_in_batches against astream_users_in_batches when
+    every fetch waits `latency` seconds on the (simulated) server and
+    every batch takes `work` seconds to process
+    """
+    processing = __import__('1-batch_processing')
+    async_streams = __import__('async_streams')
+
+    def sync_pass():
+        for batch in processing.stream_users_in_batches(batch_size):
+            time.sleep(work)
+
+    async def async_pass():
+        async for batch in async_streams.astream_users_in_batches(
+                batch_size):
+            await asyncio.sleep(work)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        use_database(seeded_database(workdir, rows), latency)
+        sync = timed("sync batches", rows, sync_pass)
+        overlapped = timed("async batches, prefetch", rows,
+                           lambda: asyncio.run(async_pass()))
+        print(f"speed-up: {sync / overlapped:.2f}x")
+
+
+def bench_read_ahead(rows, batch_size, latency, work, depth):
+    """
+    stream_users_in_batches and lazy_pagination with and without
+    read-ahead, when every round trip waits `latency` seconds and every
+    batch takes `work` seconds to process
+    """
+    processing = __import__('1-batch_processing')
+    paginate = __import__('2-lazy_paginate')
+
+    def consume(batches):
+        for batch in batches:
+            time.sleep(work)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        use_database(seeded_database(workdir, rows), latency)
+        for label, generator in [
+                ("batches", processing.stream_users_in_batches),
+                ("pages", paginate.lazy_pagination)]:
+            plain = timed(f"{label}", rows,
+                          lambda: consume(generator(batch_size)))
+            ahead = timed(f"{label}, read-ahead {depth}", rows,
+                          lambda: consume(generator(batch_size,
+                                                    prefetch=depth)))
+            print(f"speed-up: {plain / ahead:.2f}x")
+
+
+def bench_partitioned(rows, worker_counts, latency):
+    """
+    Average age over one stream_user_ages generator against
+    parallel_average_age with each worker count
+    """
+    ages = __import__('4-stream_ages')
+    scan = __import__('partitioned_scan')
+
+    def single_pass():
+        total = count = 0
+        for age in ages.stream_user_ages():
+            total += age
+            count += 1
+        return total / count
+
+    with tempfile.TemporaryDirectory() as workdir:
+        use_database(seeded_database(workdir, rows), latency)
+        single = timed("one generator", rows, single_pass)
+        for workers in worker_counts:
+            elapsed = timed(f"{workers} partitions", rows,
+                            lambda: scan.parallel_average_age(workers))
+            print(f"speed-up: {single / elapsed:.2f}x")
+        scanned = timed("partitioned_scan, 4", rows,
+                        lambda: sum(len(batch) for batch in
+                                    scan.partitioned_scan(4)))
+        print(f"speed-up: {single / scanned:.2f}x")
+
+
+def bench_incremental(rows, changed):
+    """
+    A full stream_users pass against stream_changes after `changed`
+    rows were updated since the last watermark
+    """
+    stream_users = __import__('0-stream_users').stream_users
+    incremental = __import__('incremental')
+    with tempfile.TemporaryDirectory() as workdir:
+        use_database(seeded_database(workdir, rows))
+        watermark = os.path.join(workdir, "user_data.watermark")
+
+        timed("initial stream_changes", rows,
+              lambda: sum(len(b) for b in
+                          incremental.stream_changes(watermark)))
+
+        time.sleep(0.01)  # later updated_at than the watermark
+        connection = seed.connect_to_prodev()
+        cursor = connection.cursor()
+        cursor.execute(
+            "UPDATE user_data SET age = age + 1 WHERE user_id IN "
+            "(SELECT user_id FROM user_data ORDER BY user_id LIMIT %s)",
+            (changed,)
+        )
+        connection.commit()
+        connection.close()
+
+        full = timed("full stream_users", rows,
+                     lambda: sum(1 for _ in stream_users()))
+        read = []
+        delta = timed(f"stream_changes ({changed} changed)", rows,
+                      lambda: read.append(sum(
+                          len(b) for b in
+                          incremental.stream_changes(watermark))))
+        print(f"rows read: {read[0]}  speed-up: {full / delta:.1f}x")
+
+
+def bench_snapshot(rows):
+    """
+    Average age from a columnar snapshot against the streaming and
+    database-side paths of 4-stream_ages
+    """
+    ages = __import__('4-stream_ages')
+    columnar = __import__('columnar_export')
+    with tempfile.TemporaryDirectory() as workdir:
+        use_database(seeded_database(workdir, rows))
+        path = os.path.join(workdir, "user_data.col")
+
+        timed("export_users", rows, lambda: columnar.export_users(path))
+        print(f"{'':<28} {os.path.getsize(path):,} bytes")
+        timed("stream_user_ages average", rows,
+              lambda: ages.summarize_ages(ages.stream_user_ages(), ()))
+        timed("database-side average", rows,
+              lambda: ages.summarize_ages(percentiles=()))
+
+        def snapshot_average():
+            with columnar.ColumnarSnapshot(path) as snapshot:
+                return snapshot.average_age()
+        timed("snapshot average", rows, snapshot_average)
+
+
+def bench_pool(threads, requests, size, latency):
+    """
+    Pool checkout wait and saturation when `threads` threads each fetch
+    `requests` single pages through seed.connect_to_prodev
+    """
+    paginate = __import__('2-lazy_paginate')
+    os.environ["PRODEV_POOL_SIZE"] = str(size)
+    os.environ["PRODEV_POOL_OVERFLOW"] = "0"
+
+    def client():
+        for _ in range(requests):
+            paginate.paginate_users(10, 0)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        use_database(seeded_database(workdir, 1000), latency)
+        workers = [threading.Thread(target=client) for _ in range(threads)]
+
+        def run():
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        timed(f"{threads} threads, pool of {size}", threads * requests, run)
+
+        stats = connection_pool.get_pool().stats()
+        print(f"checkouts {stats['checkouts']}, opened {stats['created']}, "
+              f"waits {stats['waits']}, "
+              f"mean wait {stats['mean_wait_time'] * 1000:.2f} ms, "
+              f"max wait {stats['max_wait_time'] * 1000:.2f} ms, "
+              f"peak in use {stats['peak_in_use']}/{stats['size']} "
+              f"(saturation {stats['saturation']:.0%})")
+        connection_pool.reset_pools()
+
+
+def stream_child(db, fetch_size):
+    """Consume stream_users over db and print rows and peak RSS as JSON"""
+    use_database(db)
+    stream_users = __import__('0-stream_users').stream_users
+    baseline = peak_rss_kb()
+    rows = sum(1 for _ in stream_users(fetch_size))
+    print(json.dumps({"rows": rows, "baseline_rss_kb": baseline,
+                      "peak_rss_kb": peak_rss_kb()}))
+
+
+def bench_stream_memory(sizes, fetch_size):
+    """
+    Peak RSS of a full stream_users pass for each table size. Every pass
+    runs in a fresh process so each peak is measured on its own.
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"{'rows':>12} {'baseline RSS':>14} {'peak RSS':>12}")
+        for rows in sizes:
+            db = seeded_database(workdir, rows)
+            result = json.loads(subprocess.check_output(
+                [sys.executable, __file__, "stream-child", "--db", db,
+                 "--fetch-size", str(fetch_size)],
+                cwd=os.path.dirname(os.path.abspath(__file__))
+            ).decode().splitlines()[-1])
+            os.remove(db)
+            print(f"{result['rows']:>12,} "
+                  f"{result['baseline_rss_kb']:>11,} KiB "
+                  f"{result['peak_rss_kb']:>9,} KiB")
+
+
+# generator name -> (make the stream, unit it yields)
+SUITE_GENERATORS = {
+    "stream_users": (
+        lambda: __import__('0-stream_users').stream_users(), "row"),
+    "stream_users_in_batches": (
+        lambda: __import__('1-batch_processing').stream_users_in_batches(
+            1000), "batch"),
+    "batch_processing": (
+        lambda: __import__('1-batch_processing').batch_processing(1000),
+        "row"),
+    "lazy_pagination": (
+        lambda: __import__('2-lazy_paginate').lazy_pagination(1000),
+        "batch"),
+    "stream_user_ages": (
+        lambda: __import__('4-stream_ages').stream_user_ages(), "row"),
+    "compute_average_age": (
+        lambda: __import__('4-stream_ages').compute_average_age, "call"),
+}
+
+
+def suite_child(db, name):
+    """
+    Run one SUITE_GENERATORS entry to completion over db and print its
+    measurements as JSON
+    """
+    use_database(db)
+    make, unit = SUITE_GENERATORS[name]
+    stream = make()  # imports the module outside the measurement
+    baseline = peak_rss_kb()
+    rows = 0
+    first_row = None
+
+    start = time.perf_counter()
+    if unit == "call":
+        with contextlib.redirect_stdout(io.StringIO()):
+            stream()
+        first_row = time.perf_counter() - start
+    else:
+        for item in stream:
+            if first_row is None:
+                first_row = time.perf_counter() - start
+            rows += len(item) if unit == "batch" else 1
+    elapsed = time.perf_counter() - start
+
+    stats = connection_pool.get_pool().stats()
+    print(json.dumps({
+        "rows": rows,
+        "seconds": elapsed,
+        "rows_per_sec": rows / elapsed if elapsed and rows else None,
+        "time_to_first_row": first_row,
+        "peak_rss_kb": peak_rss_kb(),
+        "rss_growth_kb": peak_rss_kb() - baseline,
+        "connections_opened": stats["created"],
+        "connection_checkouts": stats["checkouts"],
+    }))
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_suite(sizes, generators, output):
+    """
+    Seed a stand-in table of each size through seed.py, run every
+    generator over it in a fresh process, and write all measurements to
+    output as JSON (one record per size and generator)
+    """
+    results = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            db = seeded_database(workdir, size)
+            for name in generators:
+                measured = json.loads(subprocess.check_output(
+                    [sys.executable, __file__, "suite-child", "--db", db,
+                     "--generator", name],
+                    cwd=os.path.dirname(os.path.abspath(__file__))
+                ).decode().splitlines()[-1])
+                measured.update(size=size, generator=name)
+                results["results"].append(measured)
+                rate = measured["rows_per_sec"]
+                rate = f"{rate:12,.0f}" if rate else f"{'n/a':>12}"
+                print(f"{size:>10,} {name:<24} "
+                      f"{measured['seconds']:8.3f}s {rate} rows/sec  "
+                      f"first row {measured['time_to_first_row'] or 0:.4f}s  "
+                      f"RSS +{measured['rss_growth_kb']:,} KiB  "
+                      f"{measured['connections_opened']} conn")
+            os.remove(db)
+
+    with open(output, "w", encoding='utf-8') as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+    print(f"results written to {output}")
+
+
+def compare_results(before, after):
+    """Print the change in seconds and peak RSS between two suite runs"""
+    def load(path):
+        with open(path, "r", encoding='utf-8') as file:
+            data = json.load(file)
+        return data, {(r["size"], r["generator"]): r
+                      for r in data["results"]}
+
+    old_run, old = load(before)
+    new_run, new = load(after)
+    print(f"{old_run['commit']} -> {new_run['commit']}")
+    for key in sorted(old.keys() & new.keys()):
+        size, name = key
+        old_time, new_time = old[key]["seconds"], new[key]["seconds"]
+        change = (new_time - old_time) / old_time * 100 if old_time else 0
+        print(f"{size:>10,} {name:<24} {old_time:8.3f}s -> "
+              f"{new_time:8.3f}s ({change:+.1f}%)  RSS "
+              f"{old[key]['peak_rss_kb']:,} -> "
+              f"{new[key]['peak_rss_kb']:,} KiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    insert = sub.add_parser("insert", help="per-row vs bulk CSV insert")
+    insert.add_argument("--rows", type=int, default=100000)
+    insert.add_argument("--chunk-size", type=int, default=1000)
+    insert.add_argument("--commit-every", type=int, default=10)
+
+    parallel = sub.add_parser("parallel",
+                              help="insert_data_parallel by worker count")
+    parallel.add_argument("--rows", type=int, default=200000)
+    parallel.add_argument("--workers", type=int, nargs="+",
+                          default=[1, 2, 4, 8])
+
+    memory = sub.add_parser("stream-memory",
+                            help="stream_users peak RSS by table size")
+    memory.add_argument("--sizes", type=int, nargs="+",
+                        default=[10000, 100000, 1000000])
+    memory.add_argument("--fetch-size", type=int, default=1000)
+
+    pages = sub.add_parser("pagination",
+                           help="first/last page latency, offset vs keyset")
+    pages.add_argument("--rows", type=int, default=1000000)
+    pages.add_argument("--page-size", type=int, default=100)
+    pages.add_argument("--repeat", type=int, default=20)
+
+    columnar = sub.add_parser("columnar",
+                              help="dict-per-row vs columnar batch filter")
+    columnar.add_argument("--rows", type=int, default=200000)
+    columnar.add_argument("--batch-sizes", type=int, nargs="+",
+                          default=[50, 1000, 50000])
+
+    projection = sub.add_parser("projection",
+                                help="per-row cost of projected streams")
+    projection.add_argument("--rows", type=int, default=200000)
+    projection.add_argument("--keep", type=int, default=10000)
+
+    overlap = sub.add_parser("async",
+                             help="sync vs async prefetching batches")
+    overlap.add_argument("--rows", type=int, default=100000)
+    overlap.add_argument("--batch-size", type=int, default=1000)
+    overlap.add_argument("--latency", type=float, default=0.005,
+                         help="simulated seconds per database round trip")
+    overlap.add_argument("--work", type=float, default=0.005,
+                         help="simulated seconds of processing per batch")
+
+    ahead = sub.add_parser("read-ahead",
+                           help="batches/pages with and without read-ahead")
+    ahead.add_argument("--rows", type=int, default=100000)
+    ahead.add_argument("--batch-size", type=int, default=1000)
+    ahead.add_argument("--latency", type=float, default=0.005)
+    ahead.add_argument("--work", type=float, default=0.005)
+    ahead.add_argument("--depth", type=int, default=2)
+
+    partitioned = sub.add_parser("partitioned",
+                                 help="partitioned scan by worker count")
+    partitioned.add_argument("--rows", type=int, default=500000)
+    partitioned.add_argument("--workers", type=int, nargs="+",
+                             default=[1, 2, 4, 8])
+    partitioned.add_argument("--latency", type=float, default=0.0)
+
+    changes = sub.add_parser("incremental",
+                             help="full pass vs changes since watermark")
+    changes.add_argument("--rows", type=int, default=500000)
+    changes.add_argument("--changed", type=int, default=1000)
+
+    snapshot = sub.add_parser("snapshot",
+                              help="columnar snapshot vs database reads")
+    snapshot.add_argument("--rows", type=int, default=500000)
+
+    pool = sub.add_parser("pool", help="connection pool wait/saturation")
+    pool.add_argument("--threads", type=int, default=16)
+    pool.add_argument("--requests", type=int, default=200)
+    pool.add_argument("--size", type=int, default=4)
+    pool.add_argument("--latency", type=float, default=0.001)
+
+    suite = sub.add_parser("suite",
+                           help="every generator at each table size, "
+                                "results written as JSON")
+    suite.add_argument("--sizes", type=int, nargs="+",
+                       default=[10000, 1000000, 10000000])
+    suite.add_argument("--generators", nargs="+",
+                       choices=sorted(SUITE_GENERATORS),
+                       default=list(SUITE_GENERATORS))
+    suite.add_argument("--output", default="bench_results.json")
+
+    compare = sub.add_parser("compare", help="diff two suite result files")
+    compare.add_argument("before")
+    compare.add_argument("after")
+
+    suite_run = sub.add_parser("suite-child")
+    suite_run.add_argument("--db", required=True)
+    suite_run.add_argument("--generator", required=True)
+
+    child = sub.add_parser("stream-child")
+    child.add_argument("--db", required=True)
+    child.add_argument("--fetch-size", type=int, default=1000)
+
+    args = parser.parse_args()
+    if args.benchmark == "insert":
+        bench_insert(args.rows, args.chunk_size, args.commit_every)
+    elif args.benchmark == "parallel":
+        bench_parallel(args.rows, args.workers)
+    elif args.benchmark == "stream-memory":
+        bench_stream_memory(args.sizes, args.fetch_size)
+    elif args.benchmark == "pagination":
+        bench_pagination(args.rows, args.page_size, args.repeat)
+    elif args.benchmark == "columnar":
+        bench_columnar(args.rows, args.batch_sizes)
+    elif args.benchmark == "projection":
+        bench_projection(args.rows, args.keep)
+    elif args.benchmark == "async":
+        bench_async(args.rows, args.batch_size, args.latency, args.work)
+    elif args.benchmark == "read-ahead":
+        bench_read_ahead(args.rows, args.batch_size, args.latency, args.work,
+                         args.depth)
+    elif args.benchmark == "partitioned":
+        bench_partitioned(args.rows, args.workers, args.latency)
+    elif args.benchmark == "incremental":
+        bench_incremental(args.rows, args.changed)
+    elif args.benchmark == "snapshot":
+        bench_snapshot(args.rows)
+    elif args.benchmark == "pool":
+        bench_pool(args.threads, args.requests, args.size, args.latency)
+    elif args.benchmark == "suite":
+        bench_suite(args.sizes, args.generators, args.output)
+    elif args.benchmark == "compare":
+        compare_results(args.before, args.after)
+    elif args.benchmark == "suite-child":
+        suite_child(args.db, args.generator)
+    elif args.benchmark == "stream-child":
+        stream_child(args.db, args.fetch_size)
@@ -0,0 +1,279 @@
+#!/usr/bin/python3
+"""
+columnar_export.py - snapshot user_data into a compact columnar file and
+read it back through mmap
+
+File layout (all integers little-endian, every section 8-byte aligned):
+
+    b"UDCOLS01"              magic
+    uint64                   length of the JSON header
+    JSON header              row count and, per column, its kind and the
+                             offset/length of each section
+    sections                 fixed-width columns: one int64 per row
+                             string columns: uint64 offsets (rows + 1)
+                             followed by a UTF-8 heap
+
+age is stored exactly as int64 hundredths (DECIMAL(10,2)) and updated_at
+as int64 microseconds since the epoch.
+
+    export_users("users.col")
+    with ColumnarSnapshot("users.col") as snapshot:
+        snapshot.average_age()
+"""
+
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from projection import USER_DATA_COLUMNS
+processing = __import__('1-batch_processing')
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, columns are then memoryviews
+    np = None
+
+MAGIC = b"UDCOLS01"
+ALIGNMENT = 8
+
+# column -> kind: "str" (offsets + heap), "decimal2" or "timestamp" (int64)
+COLUMN_KINDS = {
+    "user_id": "str",
+    "name": "str",
+    "email": "str",
+    "age": "decimal2",
+    "updated_at": "timestamp",
+}
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def _encode_fixed(kind, value):
+    """int64 representation of a decimal2 or timestamp value"""
+    if kind == "decimal2":
+        return int((Decimal(value) * 100).to_integral_value())
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return (value.replace(tzinfo=None) - EPOCH) // MICROSECOND
+
+
+def _padding(size):
+    return -size % ALIGNMENT
+
+
+class _ColumnSpool:
+    """Temporary files collecting one column while the stream is read"""
+
+    def __init__(self, workdir, name, kind):
+        self.kind = kind
+        self.data = open(os.path.join(workdir, f"{name}.data"), "w+b")
+        self.offsets = None
+        self.heap_size = 0
+        if kind == "str":
+            self.offsets = open(os.path.join(workdir, f"{name}.offsets"),
+                                "w+b")
+            self.offsets.write(struct.pack("<Q", 0))
+
+    def append(self, values):
+        if self.kind != "str":
+            self.data.write(struct.pack(
+                f"<{len(values)}q",
+                *(_encode_fixed(self.kind, value) for value in values)))
+            return
+
+        encoded = [str(value).encode("utf-8") for value in values]
+        ends = []
+        for item in encoded:
+            self.heap_size += len(item)
+            ends.append(self.heap_size)
+        self.data.write(b"".join(encoded))
+        self.offsets.write(struct.pack(f"<{len(ends)}Q", *ends))
+
+    def sections(self):
+        """Spooled files in the order they go into the snapshot"""
+        files = [self.offsets, self.data] if self.offsets else [self.data]
+        for file in files:
+            file.flush()
+            file.seek(0)
+        return files
+
+    def close(self):
+        for file in (self.data, self.offsets):
+            if file is not None:
+                file.close()
+
+
+def export_users(path, batch_size=10000, columns=None):
+    """
+    Write the user_data stream from scan_users_in_batches to a
+    columnar snapshot at path and return the number of rows written.
+
+    A database error mid-scan is raised and leaves any existing file at
+    path untouched, rather than replacing it with a truncated snapshot.
+    """
+    columns = list(columns or USER_DATA_COLUMNS)
+    unknown = [name for name in columns if name not in COLUMN_KINDS]
+    if unknown:
+        raise ValueError(f"Cannot export columns: {unknown}")
+
+    rows = 0
+    with tempfile.TemporaryDirectory(
+            dir=os.path.dirname(os.path.abspath(path))) as workdir:
+        spools = {name: _ColumnSpool(workdir, name, COLUMN_KINDS[name])
+                  for name in columns}
+        try:
+            for batch in processing.scan_users_in_batches(
+                    batch_size, columns=columns, row_type="tuple"):
+                rows += len(batch)
+                for name, values in zip(columns, zip(*batch)):
+                    spools[name].append(values)
+
+            header = {"rows": rows, "columns": {}}
+            position = 0
+            for name in columns:
+                spool = spools[name]
+                entry = {"kind": spool.kind}
+                if spool.offsets is not None:
+                    entry["offsets"] = [position, (rows + 1) * 8]
+                    position += (rows + 1) * 8
+                    entry["heap"] = [position, spool.heap_size]
+                    position += spool.heap_size + _padding(spool.heap_size)
+                else:
+                    entry["data"] = [position, rows * 8]
+                    position += rows * 8
+                header["columns"][name] = entry
+
+            _write_snapshot(path, header, spools, columns)
+        finally:
+            for spool in spools.values():
+                spool.close()
+    return rows
+
+
+def _write_snapshot(path, header, spools, columns):
+    """Assemble header and spooled sections into the file at path"""
+    encoded = json.dumps(header).encode()
+    encoded += b" " * _padding(len(MAGIC) + 8 + len(encoded))
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "wb") as out:
+            out.write(MAGIC)
+            out.write(struct.pack("<Q", len(encoded)))
+            out.write(encoded)
+            for name in columns:
+                for section in spools[name].sections():
+                    shutil.copyfileobj(section, out)
+                    out.write(b"\0" * _padding(out.tell()))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class StringColumn:
+    """Zero-copy view of a string column; values are decoded on access"""
+
+    def __init__(self, offsets, heap):
+        self.offsets = offsets
+        self.heap = heap
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return bytes(self.heap[start:end]).decode("utf-8")
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+class ColumnarSnapshot:
+    """
+    Read-only, memory-mapped view of a file written by export_users.
+
+    column(name) returns the raw column without copying it: an int64
+    NumPy array (or memoryview without NumPy) for fixed-width columns,
+    a StringColumn for strings.
+    """
+
+    def __init__(self, path):
+        self._views = []
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"Not a user_data snapshot: {path}")
+
+        header_size, = struct.unpack_from("<Q", self._map, len(MAGIC))
+        start = len(MAGIC) + 8
+        header = json.loads(self._map[start:start + header_size])
+        self._base = start + header_size
+        self.rows = header["rows"]
+        self.columns = header["columns"]
+
+    def _section(self, bounds, fmt):
+        offset, size = bounds
+        view = memoryview(self._map)[self._base + offset:
+                                     self._base + offset + size]
+        self._views.append(view)
+        if fmt is None:
+            return view
+        if np is not None:
+            return np.frombuffer(view, dtype=np.dtype(f"<{fmt}"))
+        return view.cast(fmt)
+
+    def column(self, name):
+        """Zero-copy access to one column"""
+        entry = self.columns[name]
+        if entry["kind"] == "str":
+            return StringColumn(self._section(entry["offsets"], "Q"),
+                                self._section(entry["heap"], None))
+        return self._section(entry["data"], "q")
+
+    def ages(self):
+        """age column as Decimals (copies; prefer column("age") in bulk)"""
+        return [Decimal(int(cents)).scaleb(-2)
+                for cents in self.column("age")]
+
+    def average_age(self):
+        """Exact average age from the int64 hundredths column, or None"""
+        if not self.rows:
+            return None
+        cents = self.column("age")
+        total = int(cents.sum()) if np is not None else sum(cents)
+        return Decimal(total).scaleb(-2) / self.rows
+
+    def close(self):
+        """
+        Unmap the file. Columns still referenced by the caller keep the
+        mapping alive until they are garbage collected.
+        """
+        for view in self._views:
+            try:
+                view.release()
+            except BufferError:  # still exported to a NumPy array
+                pass
+        self._views = []
+        try:
+            self._map.close()
+        except BufferError:
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
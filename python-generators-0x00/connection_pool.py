@@ -0,0 +1,263 @@
+#!/usr/bin/python3
+"""
+connection_pool.py - shared, pooled connections for python-generators-0x00
+
+Credentials and pool settings come from the environment:
+
+    MYSQL_HOST (localhost)   MYSQL_PORT (3306)   MYSQL_USER (root)
+    MYSQL_PASSWORD ("")      MYSQL_DATABASE (ALX_prodev)
+    PRODEV_POOL_SIZE (5)     PRODEV_POOL_OVERFLOW (5)
+    PRODEV_POOL_IDLE_TIMEOUT (300 s)   PRODEV_POOL_CHECKOUT_TIMEOUT (30 s)
+    PRODEV_POOL_HEALTH_CHECK (1)
+    PRODEV_SQLITE_PATH       use the sqlite stand-in (standin.py) instead
+    PRODEV_SQLITE_LATENCY    simulated round trip for the stand-in (0 s)
+
+get_pool().connect() hands out a connection whose close() returns it to
+the pool, so code written for plain connections works unchanged.
+"""
+
+import os
+import threading
+import time
+import weakref
+
+import mysql.connector
+from mysql.connector.errors import PoolError
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_float(name, default):
+    return float(os.environ.get(name, default))
+
+
+def connection_settings(database=None):
+    """mysql.connector.connect keyword arguments from the environment"""
+    settings = {
+        "host": os.environ.get("MYSQL_HOST", "localhost"),
+        "port": _env_int("MYSQL_PORT", 3306),
+        "user": os.environ.get("MYSQL_USER", "root"),
+        "password": os.environ.get("MYSQL_PASSWORD", ""),
+    }
+    if database:
+        settings["database"] = database
+    return settings
+
+
+def open_connection(database=None):
+    """Open a new, unpooled connection (to the stand-in if configured)"""
+    sqlite_path = os.environ.get("PRODEV_SQLITE_PATH")
+    if sqlite_path:
+        import standin
+        return standin.connect(sqlite_path,
+                               _env_float("PRODEV_SQLITE_LATENCY", 0.0))
+    return mysql.connector.connect(**connection_settings(database))
+
+
+class PooledConnection:
+    """
+    Proxy for a pooled connection: close() hands it back to the pool,
+    everything else goes to the real connection. A proxy garbage
+    collected without being closed still returns its connection.
+    """
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+        # holds the connection, not the proxy, so it cannot keep it alive
+        self._finalizer = weakref.finalize(self, pool._release, connection)
+
+    def __getattr__(self, name):
+        if self._connection is None:
+            raise PoolError(msg="Connection already returned to the pool")
+        return getattr(self._connection, name)
+
+    def close(self):
+        if self._finalizer.detach() is not None:
+            connection, self._connection = self._connection, None
+            self._pool._release(connection)
+
+
+class ConnectionPool:
+    """
+    Bounded pool of database connections.
+
+    Up to size connections are kept open and reused; up to max_overflow
+    more are opened under load and closed when returned. Connections idle
+    for longer than idle_timeout seconds are closed instead of reused, and
+    with health_check each one is checked (is_connected) on checkout.
+    When every connection is in use, connect() waits up to
+    checkout_timeout seconds and then raises PoolError.
+    """
+
+    def __init__(self, factory, size=5, max_overflow=5, idle_timeout=300.0,
+                 checkout_timeout=30.0, health_check=True):
+        self.factory = factory
+        self.size = size
+        self.max_overflow = max_overflow
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.health_check = health_check
+        self.pid = os.getpid()
+
+        self._idle = []  # (connection, returned_at), most recent last
+        self._open = 0
+        self._in_use = 0
+        self._lock = threading.Condition()
+        self._metrics = {
+            "checkouts": 0, "created": 0, "discarded": 0,
+            "waits": 0, "wait_time": 0.0, "max_wait_time": 0.0,
+            "overflow_checkouts": 0, "timeouts": 0, "peak_in_use": 0,
+        }
+
+    def connect(self):
+        """Check a connection out of the pool"""
+        start = time.perf_counter()
+        deadline = start + self.checkout_timeout
+        waited = False
+
+        with self._lock:
+            while True:
+                connection = self._take_idle()
+                if connection is not None:
+                    break
+                if self._open < self.size + self.max_overflow:
+                    self._open += 1
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self._metrics["timeouts"] += 1
+                    raise PoolError(msg="Connection pool exhausted "
+                                        f"({self._open} connections in use)")
+                waited = True
+                self._lock.wait(remaining)
+            self._checked_out(start, waited)
+
+        if connection is None:
+            try:
+                connection = self.factory()
+            except Exception:
+                with self._lock:
+                    self._open -= 1
+                    self._in_use -= 1
+                    self._lock.notify()
+                raise
+            with self._lock:
+                self._metrics["created"] += 1
+        return PooledConnection(self, connection)
+
+    def _take_idle(self):
+        """Most recently used idle connection that is still good, or None"""
+        now = time.monotonic()
+        while self._idle:
+            connection, returned_at = self._idle.pop()
+            if now - returned_at > self.idle_timeout or (
+                    self.health_check and not self._healthy(connection)):
+                self._discard(connection)
+                continue
+            return connection
+        return None
+
+    @staticmethod
+    def _healthy(connection):
+        try:
+            return connection.is_connected()
+        except Exception:
+            return False
+
+    def _discard(self, connection):
+        self._open -= 1
+        self._metrics["discarded"] += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _checked_out(self, start, waited):
+        wait_time = time.perf_counter() - start
+        self._in_use += 1
+        metrics = self._metrics
+        metrics["checkouts"] += 1
+        metrics["wait_time"] += wait_time
+        metrics["max_wait_time"] = max(metrics["max_wait_time"], wait_time)
+        metrics["peak_in_use"] = max(metrics["peak_in_use"], self._in_use)
+        if waited:
+            metrics["waits"] += 1
+        if self._in_use > self.size:
+            metrics["overflow_checkouts"] += 1
+
+    def _release(self, connection):
+        """Take a connection back, resetting or closing it"""
+        reusable = not getattr(connection, "unread_result", False)
+        if reusable:
+            try:
+                connection.rollback()
+            except Exception:
+                reusable = False
+
+        with self._lock:
+            self._in_use -= 1
+            if reusable and len(self._idle) < self.size:
+                self._idle.append((connection, time.monotonic()))
+            else:
+                # overflow, or a stream abandoned mid-result
+                self._discard(connection)
+            self._lock.notify()
+
+    def stats(self):
+        """Pool metrics: checkouts, wait times, saturation and sizes"""
+        with self._lock:
+            stats = dict(self._metrics)
+            stats.update(open=self._open, idle=len(self._idle),
+                         in_use=self._in_use, size=self.size,
+                         max_overflow=self.max_overflow)
+        checkouts = stats["checkouts"]
+        stats["mean_wait_time"] = (stats["wait_time"] / checkouts
+                                   if checkouts else 0.0)
+        stats["saturation"] = stats["peak_in_use"] / (self.size or 1)
+        return stats
+
+    def close(self):
+        """Close every idle connection"""
+        with self._lock:
+            while self._idle:
+                self._discard(self._idle.pop()[0])
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(database=None):
+    """
+    Shared pool for database (MYSQL_DATABASE by default), configured from
+    the environment. A forked child process gets a fresh pool rather than
+    the parent's connections.
+    """
+    database = database or os.environ.get("MYSQL_DATABASE", "ALX_prodev")
+    with _pools_lock:
+        pool = _pools.get(database)
+        if pool is None or pool.pid != os.getpid():
+            pool = ConnectionPool(
+                lambda: open_connection(database),
+                size=_env_int("PRODEV_POOL_SIZE", 5),
+                max_overflow=_env_int("PRODEV_POOL_OVERFLOW", 5),
+                idle_timeout=_env_float("PRODEV_POOL_IDLE_TIMEOUT", 300),
+                checkout_timeout=_env_float("PRODEV_POOL_CHECKOUT_TIMEOUT",
+                                            30),
+                health_check=os.environ.get("PRODEV_POOL_HEALTH_CHECK",
+                                            "1") != "0",
+            )
+            _pools[database] = pool
+        return pool
+
+
+def reset_pools():
+    """Close and forget every shared pool (after changing settings)"""
+    with _pools_lock:
+        for pool in _pools.values():
+            if pool.pid == os.getpid():
+                pool.close()
+        _pools.clear()
@@ -0,0 +1,187 @@
+#!/usr/bin/python3
+"""
+partitioned_scan.py - scan user_data in parallel, one key range per
+worker process
+
+user_id values are UUIDs, so splitting the hex key space evenly gives
+partitions of about the same size without asking the database. Each
+partition is streamed over its own connection by
+scan_users_in_batches with a user_id range predicate, so a partition
+that fails raises in the parent instead of coming back short.
+
+    for batch in partitioned_scan(partitions=4):
+        ...
+    total, count = partitioned_map_reduce(age_totals, add_totals,
+                                          partitions=4, columns=["age"],
+                                          row_type="tuple")
+"""
+
+import multiprocessing
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+
+from predicates import where
+from projection import USER_DATA_COLUMNS, row_converter
+processing = __import__('1-batch_processing')
+
+_DONE = "done"
+_ERROR = "error"
+
+
+def partition_bounds(partitions):
+    """
+    Split the user_id key space into `partitions` ranges (lo, hi), with
+    lo inclusive, hi exclusive and None meaning unbounded
+    """
+    if partitions < 1:
+        raise ValueError("partitions must be at least 1")
+    cuts = [format(i * 16 ** 8 // partitions, "08x")
+            for i in range(1, partitions)]
+    return list(zip([None] + cuts, cuts + [None]))
+
+
+def partition_predicate(lo, hi):
+    """Predicate selecting user_id in [lo, hi)"""
+    parts = []
+    if lo is not None:
+        parts.append(where("user_id", ">=", lo))
+    if hi is not None:
+        parts.append(where("user_id", "<", hi))
+    if not parts:
+        return None
+    return reduce(lambda left, right: left & right, parts)
+
+
+def scan_partition(lo, hi, batch_size=1000, columns=None, row_type="dict"):
+    """
+    Generator over the batches of one partition, on its own connection;
+    database errors are raised
+    """
+    return processing.scan_users_in_batches(
+        batch_size, partition_predicate(lo, hi), columns, row_type)
+
+
+def _feed_partition(results, lo, hi, batch_size, columns):
+    """Worker process: put the partition's tuple batches on results"""
+    try:
+        for batch in scan_partition(lo, hi, batch_size, columns, "tuple"):
+            results.put(batch)
+        results.put(_DONE)
+    except Exception as e:
+        results.put((_ERROR, repr(e)))
+
+
+def partitioned_scan(partitions=4, batch_size=1000, columns=None,
+                     row_type="dict", max_queued=None):
+    """
+    Generator over the batches of every partition, scanned concurrently
+    by one process each and merged in arrival order (so batches are not
+    in user_id order).
+
+    At most max_queued batches (default 2 * partitions) wait in the
+    queue, so a slow consumer holds the workers back instead of letting
+    memory grow. Closing the generator stops the workers. A worker that
+    dies without reporting (killed, crashed) raises RuntimeError.
+    """
+    names = list(columns) if columns else list(USER_DATA_COLUMNS)
+    convert = row_converter(names, row_type)
+    results = multiprocessing.Queue(maxsize=max_queued or 2 * partitions)
+    workers = [multiprocessing.Process(
+                   target=_feed_partition,
+                   args=(results, lo, hi, batch_size, columns),
+                   daemon=True)
+               for lo, hi in partition_bounds(partitions)]
+    for worker in workers:
+        worker.start()
+
+    running = len(workers)
+    lost = False
+    try:
+        while running:
+            try:
+                batch = results.get(timeout=0.5)
+            except queue.Empty:
+                # Fewer workers alive than have yet to report _DONE: one
+                # died without reporting. Checked on two empty polls in a
+                # row, since a worker's last put may land just after it
+                # exits.
+                alive = sum(worker.exitcode is None for worker in workers)
+                if alive < running and lost:
+                    codes = [worker.exitcode for worker in workers]
+                    raise RuntimeError("Partition scan failed: a worker "
+                                       f"died (exit codes {codes})")
+                lost = alive < running
+                continue
+            lost = False
+            if batch == _DONE:
+                running -= 1
+                continue
+            if isinstance(batch, tuple) and batch[:1] == (_ERROR,):
+                raise RuntimeError(f"Partition scan failed: {batch[1]}")
+            if convert is not None:
+                batch = [convert(row) for row in batch]
+            yield batch
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in workers:
+            worker.join()
+        results.close()
+        results.cancel_join_thread()
+
+
+def _map_reduce_partition(lo, hi, map_batch, reduce_results, batch_size,
+                          columns, row_type):
+    """Worker process: fold map_batch over one partition's batches"""
+    mapped = (map_batch(batch) for batch in
+              scan_partition(lo, hi, batch_size, columns, row_type))
+    return reduce(reduce_results, mapped, None)
+
+
+def partitioned_map_reduce(map_batch, reduce_results, partitions=4,
+                           batch_size=1000, columns=None, row_type="dict"):
+    """
+    Apply map_batch to every batch of user_data and combine the results
+    with reduce_results(a, b), scanning each partition in its own process.
+
+    reduce_results is called with None as the first argument for the
+    first result of each partition, and both functions must be picklable
+    (defined at module level). Returns None for an empty table; an error
+    in any partition is raised here.
+    """
+    with ProcessPoolExecutor(max_workers=partitions) as pool:
+        futures = [pool.submit(_map_reduce_partition, lo, hi, map_batch,
+                               reduce_results, batch_size, columns, row_type)
+                   for lo, hi in partition_bounds(partitions)]
+        partials = [future.result() for future in futures]
+
+    return reduce(reduce_results,
+                  (partial for partial in partials if partial is not None),
+                  None)
+
+
+def age_totals(batch):
+    """
+    map_batch for averages: (sum of ages, row count) of a batch of
+    ("age",) tuple rows
+    """
+    return sum(row[0] for row in batch), len(batch)
+
+
+def add_totals(left, right):
+    """reduce_results for age_totals"""
+    if left is None:
+        return right
+    return left[0] + right[0], left[1] + right[1]
+
+
+def parallel_average_age(partitions=4):
+    """Average user age computed by a partitioned scan, or None"""
+    totals = partitioned_map_reduce(age_totals, add_totals, partitions,
+                                    batch_size=10000, columns=["age"],
+                                    row_type="tuple")
+    if not totals or not totals[1]:
+        return None
+    return totals[0] / totals[1]
@@ -0,0 +1,165 @@
+#!/usr/bin/python3
+"""
+predicates.py - small, safe row filters that can be pushed down to SQL
+
+    from predicates import where
+    adults = where("age", ">", 25) & where("email", "like", "%@gmail.com")
+
+A predicate compiles to a parameterized WHERE clause when it can (known
+column, SQL operator); anything else is evaluated on the client with
+matches(row).
+"""
+
+import operator
+import re
+
+from projection import USER_DATA_COLUMNS
+
+
+def _like(value, pattern):
+    """
+    Python version of SQL LIKE (% and _ wildcards), case-insensitive
+    like MySQL's default collations
+    """
+    regex = "".join(".*" if char == "%" else "." if char == "_"
+                    else re.escape(char) for char in pattern)
+    flags = re.DOTALL | re.IGNORECASE
+    return re.fullmatch(regex, str(value), flags) is not None
+
+
+# operator -> (SQL operator, Python function)
+SQL_OPERATORS = {
+    "=": ("=", operator.eq),
+    "==": ("=", operator.eq),
+    "!=": ("<>", operator.ne),
+    "<": ("<", operator.lt),
+    "<=": ("<=", operator.le),
+    ">": (">", operator.gt),
+    ">=": (">=", operator.ge),
+    "in": ("IN", lambda value, options: value in options),
+    "like": ("LIKE", _like),
+}
+
+
+class Predicate:
+    """Base class: combine predicates with & (AND) and | (OR)"""
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def matches(self, row):
+        """Evaluate the predicate on a row dict"""
+        raise NotImplementedError
+
+    def pushdown(self):
+        """
+        Split into (sql, params, residual): a WHERE clause fragment with
+        its parameters for the part SQL can evaluate (sql is None if no
+        part can), and the predicate left for the client (or None).
+        """
+        raise NotImplementedError
+
+
+class Condition(Predicate):
+    """field <op> value; op is a key of SQL_OPERATORS or a callable"""
+
+    def __init__(self, field, op, value):
+        if not callable(op) and op not in SQL_OPERATORS:
+            raise ValueError(f"Unsupported operator: {op!r}")
+        if op == "in":
+            value = tuple(value)
+        self.field = field
+        self.op = op
+        self.value = value
+
+    def __repr__(self):
+        return f"where({self.field!r}, {self.op!r}, {self.value!r})"
+
+    def matches(self, row):
+        check = self.op if callable(self.op) else SQL_OPERATORS[self.op][1]
+        return check(row[self.field], self.value)
+
+    def pushdown(self):
+        if callable(self.op) or self.field not in USER_DATA_COLUMNS:
+            return None, (), self
+        sql_op = SQL_OPERATORS[self.op][0]
+        if sql_op == "IN":
+            if not self.value:
+                return "1 = 0", (), None
+            placeholders = ", ".join(["%s"] * len(self.value))
+            return f"{self.field} IN ({placeholders})", self.value, None
+        return f"{self.field} {sql_op} %s", (self.value,), None
+
+
+class And(Predicate):
+    """All parts must hold; pushable parts go to SQL, the rest stay here"""
+
+    def __init__(self, *parts):
+        self.parts = parts
+
+    def __repr__(self):
+        return " & ".join(f"({part!r})" for part in self.parts)
+
+    def matches(self, row):
+        return all(part.matches(row) for part in self.parts)
+
+    def pushdown(self):
+        clauses, params, residual = [], [], []
+        for part in self.parts:
+            sql, part_params, rest = part.pushdown()
+            if sql is not None:
+                clauses.append(f"({sql})")
+                params.extend(part_params)
+            if rest is not None:
+                residual.append(rest)
+
+        sql = " AND ".join(clauses) if clauses else None
+        if not residual:
+            rest = None
+        elif len(residual) == 1:
+            rest = residual[0]
+        else:
+            rest = And(*residual)
+        return sql, tuple(params), rest
+
+
+class Or(Predicate):
+    """Any part may hold; pushed down only if every part can be"""
+
+    def __init__(self, *parts):
+        self.parts = parts
+
+    def __repr__(self):
+        return " | ".join(f"({part!r})" for part in self.parts)
+
+    def matches(self, row):
+        return any(part.matches(row) for part in self.parts)
+
+    def pushdown(self):
+        clauses, params = [], []
+        for part in self.parts:
+            sql, part_params, rest = part.pushdown()
+            if sql is None or rest is not None:
+                return None, (), self
+            clauses.append(f"({sql})")
+            params.extend(part_params)
+        return " OR ".join(clauses), tuple(params), None
+
+
+def where(field, op, value):
+    """Build a Condition: where("age", ">", 25)"""
+    return Condition(field, op, value)
+
+
+def compile_where(predicate):
+    """
+    Return (" WHERE ..." or "", params, residual) for predicate,
+    ready to append to a SELECT on user_data.
+    """
+    if predicate is None:
+        return "", (), None
+    sql, params, residual = predicate.pushdown()
+    return (f" WHERE {sql}" if sql else ""), params, residual
@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+"""
+projection.py - column projection and row shapes for the user_data
+generators
+
+A projection selects only the listed columns, and rows can come back as
+dicts (the default), plain tuples or namedtuple records (no per-row
+__dict__), which are much lighter than dicts.
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+# Columns of the user_data table (see seed.create_table)
+USER_DATA_COLUMNS = ("user_id", "name", "email", "age", "updated_at")
+
+ROW_TYPES = ("dict", "tuple", "record")
+
+
+def select_list(columns=None):
+    """SQL select list for columns (None means every column)"""
+    if columns is None:
+        return "*"
+    if isinstance(columns, str) or not columns:
+        raise ValueError("columns must be a non-empty sequence of names")
+    unknown = [name for name in columns if name not in USER_DATA_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown user_data columns: {unknown}")
+    return ", ".join(columns)
+
+
+@lru_cache(maxsize=None)
+def record_type(names):
+    """namedtuple class for a tuple of column names (built once per shape)"""
+    return namedtuple("UserRecord", names)
+
+
+def row_converter(names, row_type="dict"):
+    """
+    Function turning a raw tuple row with the given column names into a
+    row_type row, or None when the tuple can be used as is.
+    """
+    if row_type not in ROW_TYPES:
+        raise ValueError(f"row_type must be one of {ROW_TYPES}")
+    if row_type == "tuple":
+        return None
+    if row_type == "record":
+        return record_type(tuple(names))._make
+    return lambda row: dict(zip(names, row))
+
+
+def column_names(cursor):
+    """Column names of the last query run on cursor"""
+    return [column[0] for column in cursor.description]
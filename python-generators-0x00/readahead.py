@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+"""
+readahead.py - fetch the next batches on a background thread
+
+    for batch in read_ahead(stream_users_in_batches(1000), depth=2):
+        ...
+
+While the consumer works on one batch, a background thread is already
+waiting on the database for the next ones.
+"""
+
+import queue
+import threading
+
+# Hand-off between a producer thread and its consumer (also used by
+# async_streams.py): DONE follows the last item, a Failure carries the
+# exception that ended the producer.
+DONE = object()
+
+
+class Failure:
+    """Carries an exception from a producer thread to the consumer"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def received(item):
+    """Item taken from a producer: raise a Failure's error, else return it"""
+    if isinstance(item, Failure):
+        raise item.error
+    return item
+
+
+def read_ahead(iterable, depth=2):
+    """
+    Generator over iterable that keeps up to depth items fetched ahead
+    by a background thread.
+
+    Exceptions raised while fetching are re-raised to the consumer at the
+    point they happened. Closing this generator (or breaking out of the
+    loop) stops the thread and closes iterable on it.
+    """
+    ready = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def put(item):
+        """Queue item unless the consumer has gone away"""
+        while not stop.is_set():
+            try:
+                ready.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(DONE)
+        except Exception as e:
+            put(Failure(e))
+        finally:
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=producer, name="read-ahead",
+                              daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = received(ready.get())
+            if item is DONE:
+                break
+            yield item
+    finally:
+        stop.set()
+        thread.join()
@@ -4,22 +4,27 @@ seed.py - Creates ALX_prodev database, user_data table,
 and inserts data from user_data.csv
 """
 
-import mysql.connector
 from mysql.connector import Error
+import argparse
 import csv
+import json
+import os
+import queue
+import threading
+import time
 import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from connection_pool import get_pool, open_connection
 
 
 # -----------------------------------------------------------
 # 1. Connect to MySQL server (NO database selected yet)
+#    Credentials come from the environment (see connection_pool.py)
 # -----------------------------------------------------------
 def connect_db():
     try:
-        connection = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="Bondeni001."    # add password if you have one
-        )
+        connection = open_connection()
         return connection
     except Error as e:
         print(f"Error connecting to MySQL: {e}")
@@ -40,36 +45,81 @@ def create_database(connection):
 
 # -----------------------------------------------------------
 # 3. Connect directly to ALX_prodev database
+#    Connections come from the shared pool; close() returns them
 # -----------------------------------------------------------
 def connect_to_prodev():
     try:
-        connection = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="Bondeni001.",   # add password if needed
-            database="ALX_prodev"
-        )
+        connection = get_pool().connect()
         return connection
     except Error as e:
         print(f"Error connecting to ALX_prodev: {e}")
         return None
 
 
+def connect_to_prodev_unpooled():
+    """
+    A dedicated connection to ALX_prodev, outside the shared pool, for
+    work that holds it for a long time (the parallel loader's writers)
+    """
+    try:
+        return open_connection(os.environ.get("MYSQL_DATABASE",
+                                              "ALX_prodev"))
+    except Error as e:
+        print(f"Error connecting to ALX_prodev: {e}")
+        return None
+
+
 # -----------------------------------------------------------
 # 4. Create user_data table if it does not exist
 # -----------------------------------------------------------
+# updated_at is set on insert and bumped by MySQL on every update, so
+# changes can be read incrementally (see incremental.py)
+UPDATED_AT_COLUMN = (
+    "updated_at TIMESTAMP(6) NOT NULL "
+    "DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)"
+)
+
+ER_DUP_FIELDNAME = 1060
+ER_DUP_KEYNAME = 1061
+
+
+def _create_updated_at_index(cursor):
+    """Index (updated_at, user_id) unless it already exists"""
+    try:
+        cursor.execute(
+            "CREATE INDEX idx_user_data_updated_at "
+            "ON user_data (updated_at, user_id)"
+        )
+    except Error as e:
+        if e.errno != ER_DUP_KEYNAME:
+            raise
+
+
+def _add_updated_at_column(cursor):
+    """Add updated_at to a user_data table created without it"""
+    try:
+        cursor.execute(f"ALTER TABLE user_data ADD COLUMN {UPDATED_AT_COLUMN}")
+    except Error as e:
+        if e.errno != ER_DUP_FIELDNAME:
+            raise
+
+
 def create_table(connection):
     try:
-        query = """
+        query = f"""
         CREATE TABLE IF NOT EXISTS user_data (
             user_id CHAR(36) PRIMARY KEY,
             name VARCHAR(255) NOT NULL,
             email VARCHAR(255) NOT NULL,
-            age DECIMAL(10,2) NOT NULL
+            age DECIMAL(10,2) NOT NULL,
+            {UPDATED_AT_COLUMN}
         );
         """
         cursor = connection.cursor()
         cursor.execute(query)
+        # An existing table may predate change tracking
+        _add_updated_at_column(cursor)
+        _create_updated_at_index(cursor)
         connection.commit()
         cursor.close()
         print("Table user_data created successfully")
@@ -77,6 +127,22 @@ def create_table(connection):
         print(f"Error creating table: {e}")
 
 
+def add_change_tracking(connection):
+    """
+    Add the updated_at column and its index to a user_data table
+    created before they existed (existing rows get the current time)
+    """
+    try:
+        cursor = connection.cursor()
+        _add_updated_at_column(cursor)
+        _create_updated_at_index(cursor)
+        connection.commit()
+        cursor.close()
+        print("Change tracking added to user_data")
+    except Error as e:
+        print(f"Error adding change tracking: {e}")
+
+
 # -----------------------------------------------------------
 # 5. Insert data from CSV file into user_data table
 # -----------------------------------------------------------
@@ -109,3 +175,331 @@ def insert_data(connection, csv_file):
         print(f"CSV file not found: {csv_file}")
 
 
+# -----------------------------------------------------------
+# 6. Bulk insert: stream the CSV in chunks, one executemany per chunk
+# -----------------------------------------------------------
+INSERT_USER_QUERY = """
+    INSERT IGNORE INTO user_data (user_id, name, email, age)
+    VALUES (%s, %s, %s, %s)
+"""
+
+USER_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "ALX_prodev/user_data")
+
+
+def user_id_for(email):
+    """Deterministic user_id derived from the email (uuid5)"""
+    return str(uuid.uuid5(USER_ID_NAMESPACE, email))
+
+
+def _read_record(file):
+    """Read one raw CSV record, joining lines split inside quotes"""
+    record = file.readline()
+    while record.count(b'"') % 2:
+        line = file.readline()
+        if not line:
+            break
+        record += line
+    return record
+
+
+def read_csv_in_chunks(csv_file, chunk_size, offset=0):
+    """
+    Generator that yields (rows, next_offset) for chunks of at most
+    chunk_size CSV rows, so the whole file is never held in memory.
+
+    next_offset is the byte offset just past the chunk; passing it back
+    as offset resumes reading from the following row.
+    """
+    with open(csv_file, "rb") as file:
+        header_line = _read_record(file).decode('utf-8-sig')
+        header = next(csv.reader(header_line.splitlines()))
+        file.seek(max(offset, file.tell()))
+        chunk = []
+
+        while True:
+            record = _read_record(file)
+            if not record:
+                break
+            if not record.strip():
+                continue
+
+            values = next(csv.reader(
+                record.decode('utf-8').splitlines(keepends=True)))
+            chunk.append(dict(zip(header, values)))
+
+            if len(chunk) == chunk_size:
+                yield chunk, file.tell()
+                chunk = []
+
+        if chunk:
+            yield chunk, file.tell()
+
+
+def load_checkpoint(checkpoint_file):
+    """Return (offset, rows) saved in checkpoint_file, or (0, 0)"""
+    try:
+        with open(checkpoint_file, "r", encoding='utf-8') as file:
+            checkpoint = json.load(file)
+        return checkpoint["offset"], checkpoint["rows"]
+    except (FileNotFoundError, ValueError, KeyError):
+        return 0, 0
+
+
+def save_checkpoint(checkpoint_file, offset, rows):
+    """Atomically record how far the load got"""
+    tmp_file = f"{checkpoint_file}.tmp"
+    with open(tmp_file, "w", encoding='utf-8') as file:
+        json.dump({"offset": offset, "rows": rows}, file)
+    os.replace(tmp_file, checkpoint_file)
+
+
+def insert_data_bulk(connection, csv_file, chunk_size=1000, commit_every=10,
+                     checkpoint_file=None):
+    """
+    Insert records from csv_file using one executemany call per chunk
+    of chunk_size rows (mysql.connector turns it into a multi-row INSERT).
+
+    The transaction is committed every commit_every chunks, so a failure
+    only rolls back the chunks since the last commit. Each row gets a
+    deterministic user_id (user_id_for), so loading the same file twice
+    does not duplicate users.
+
+    If checkpoint_file is given, the byte offset reached is saved after
+    every commit and an interrupted load resumes from it; the checkpoint
+    is removed once the whole file is in. Returns the number of rows
+    committed by this call.
+    """
+    committed = 0
+    pending = 0
+    chunks_since_commit = 0
+    offset, done_before = 0, 0
+    if checkpoint_file:
+        offset, done_before = load_checkpoint(checkpoint_file)
+        if offset:
+            print(f"Resuming after row {done_before} (byte {offset})")
+
+    start = time.perf_counter()
+
+    def commit(next_offset):
+        nonlocal committed, pending, chunks_since_commit
+        connection.commit()
+        committed += pending
+        pending = 0
+        chunks_since_commit = 0
+        if checkpoint_file:
+            save_checkpoint(checkpoint_file, next_offset,
+                            done_before + committed)
+
+    try:
+        cursor = connection.cursor()
+
+        for chunk, next_offset in read_csv_in_chunks(csv_file, chunk_size,
+                                                     offset):
+            cursor.executemany(
+                INSERT_USER_QUERY,
+                [(user_id_for(row["email"]), row["name"], row["email"],
+                  row["age"]) for row in chunk]
+            )
+            pending += len(chunk)
+            chunks_since_commit += 1
+
+            if chunks_since_commit == commit_every:
+                commit(next_offset)
+
+        if chunks_since_commit:
+            commit(next_offset)
+        cursor.close()
+
+        if checkpoint_file and os.path.exists(checkpoint_file):
+            os.remove(checkpoint_file)
+
+    except Error as e:
+        connection.rollback()
+        print(f"Error inserting data: {e} ({committed} rows committed)")
+
+    except FileNotFoundError:
+        print(f"CSV file not found: {csv_file}")
+
+    elapsed = time.perf_counter() - start
+    rate = committed / elapsed if elapsed > 0 else 0.0
+    print(f"Inserted {committed} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+    return committed
+
+
+# -----------------------------------------------------------
+# 7. Parallel insert: parse byte ranges in processes, insert
+#    through a fixed set of connections
+# -----------------------------------------------------------
+def split_csv_ranges(csv_file, range_bytes):
+    """
+    Generator that yields (start, end) byte ranges of about range_bytes
+    covering the data rows of csv_file. Every boundary is moved forward
+    to the start of a line, so each range holds whole rows (rows must not
+    contain quoted newlines, which is true for user_data.csv).
+    """
+    size = os.path.getsize(csv_file)
+    with open(csv_file, "rb") as file:
+        _read_record(file)  # skip the header
+        start = file.tell()
+
+        while start < size:
+            file.seek(min(start + range_bytes, size))
+            if file.tell() < size:
+                file.readline()  # finish the current line
+            end = file.tell()
+            yield start, end
+            start = end
+
+
+def _parse_range(csv_file, start, end):
+    """Parse the rows in [start, end) into INSERT_USER_QUERY parameters"""
+    with open(csv_file, "rb") as file:
+        header = next(csv.reader(
+            file.readline().decode('utf-8-sig').splitlines()))
+        file.seek(start)
+        lines = file.read(end - start).decode('utf-8').splitlines()
+
+    return [(user_id_for(row["email"]), row["name"], row["email"], row["age"])
+            for row in csv.DictReader(lines, fieldnames=header) if row]
+
+
+def _count_rows(csv_file, start, end):
+    """Number of lines in [start, end), for a range that failed to parse"""
+    with open(csv_file, "rb") as file:
+        file.seek(start)
+        return len(file.read(end - start).splitlines())
+
+
+def insert_data_parallel(csv_file, workers=4, connections=None,
+                         connect=None, range_bytes=1 << 20,
+                         max_in_flight=None):
+    """
+    Insert records from csv_file using a pool of `workers` processes to
+    parse byte ranges of the file and `connections` writer threads (each
+    with its own connection from connect()) to insert one executemany
+    batch per range. By default writers open unpooled connections
+    (connect_to_prodev_unpooled), since each holds its connection for
+    the whole load and more writers than the shared pool allows would
+    otherwise wait on it and fail.
+
+    At most max_in_flight batches (default 2 * workers) are being parsed
+    or waiting for a writer at any time, so memory stays bounded however
+    large the file is. Prints a throughput report and returns the number
+    of rows inserted.
+    """
+    connect = connect or connect_to_prodev_unpooled
+    connections = connections or workers
+    max_in_flight = max_in_flight or 2 * workers
+
+    writer_connections = [connect() for _ in range(connections)]
+    if not all(writer_connections):
+        for connection in filter(None, writer_connections):
+            connection.close()
+        print("Error: could not open the writer connections")
+        return 0
+
+    slots = threading.BoundedSemaphore(max_in_flight)
+    batches = queue.Queue()
+    lock = threading.Lock()
+    totals = {"rows": 0, "failed": 0}
+
+    errors = []
+
+    def writer(connection):
+        try:
+            cursor = connection.cursor()
+            while True:
+                item = batches.get()
+                if item is None:
+                    break
+                future, range_start, range_end = item
+                rows = None
+                try:
+                    rows = future.result()
+                    cursor.executemany(INSERT_USER_QUERY, rows)
+                    connection.commit()
+                    with lock:
+                        totals["rows"] += len(rows)
+                except Exception as e:  # a bad batch must not stop the writer
+                    if rows is None:
+                        rows = range(_count_rows(csv_file, range_start,
+                                                 range_end))
+                    with lock:
+                        totals["failed"] += len(rows)
+                    print(f"Error inserting batch: {e}")
+                    connection.rollback()
+                finally:
+                    slots.release()
+            cursor.close()
+        except Exception as e:  # the connection itself is unusable
+            errors.append(e)
+        finally:
+            connection.close()
+
+    def wait_for_slot():
+        # Writers that all exited would never release a slot again
+        while not slots.acquire(timeout=0.5):
+            if not any(thread.is_alive() for thread in threads):
+                raise errors[0] if errors else RuntimeError(
+                    "every writer thread has exited")
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=writer, args=(connection,))
+               for connection in writer_connections]
+    for thread in threads:
+        thread.start()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for range_start, range_end in split_csv_ranges(csv_file,
+                                                           range_bytes):
+                wait_for_slot()
+                batches.put((pool.submit(_parse_range, csv_file,
+                                         range_start, range_end),
+                             range_start, range_end))
+    except FileNotFoundError:
+        print(f"CSV file not found: {csv_file}")
+    finally:
+        for _ in threads:
+            batches.put(None)
+        for thread in threads:
+            thread.join()
+    if errors:
+        print(f"Error: {len(errors)} writer(s) stopped early: {errors[0]}")
+
+    elapsed = time.perf_counter() - start
+    rate = totals["rows"] / elapsed if elapsed > 0 else 0.0
+    print(f"Inserted {totals['rows']} rows in {elapsed:.2f}s "
+          f"({rate:,.0f} rows/sec) with {workers} parse workers, "
+          f"{connections} connections; {totals['failed']} rows failed")
+    return totals["rows"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Create ALX_prodev.user_data and load it from a CSV file")
+    parser.add_argument("csv_file", nargs="?", default="user_data.csv")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="parse processes and writer connections; "
+                             "1 uses the single-connection bulk loader")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--checkpoint", default=None,
+                        help="checkpoint file for a resumable load "
+                             "(single worker only)")
+    args = parser.parse_args()
+
+    connection = connect_db()
+    if connection:
+        create_database(connection)
+        connection.close()
+
+        connection = connect_to_prodev()
+        if connection:
+            create_table(connection)
+            if args.workers > 1:
+                connection.close()
+                insert_data_parallel(args.csv_file, workers=args.workers)
+            else:
+                insert_data_bulk(connection, args.csv_file, args.chunk_size,
+                                 checkpoint_file=args.checkpoint)
+                connection.close()
@@ -0,0 +1,217 @@
+#!/usr/bin/python3
+"""
+standin.py - a small MySQL stand-in backed by sqlite3
+
+Lets seed.py and the generators run locally (benchmarks, quick checks)
+without a MySQL server. Only the pieces of the mysql.connector API used
+in this project are provided, and sqlite errors are re-raised as
+mysql.connector.Error so the existing error handling still applies.
+"""
+
+import re
+import sqlite3
+import time
+from decimal import Decimal
+from mysql.connector import Error
+
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_converter("DECIMAL", lambda raw: Decimal(raw.decode()))
+
+
+# MySQL-only syntax -> sqlite equivalent
+_NOW = "(strftime('%Y-%m-%d %H:%M:%f000', 'now'))"
+_REWRITES = [
+    (re.compile(r"\bINSERT IGNORE\b"), "INSERT OR IGNORE"),
+    (re.compile(r"\bTIMESTAMP\(6\)"), "TIMESTAMP"),
+    (re.compile(r"\s+ON UPDATE CURRENT_TIMESTAMP\(6\)"), ""),
+    (re.compile(r"\bCURRENT_TIMESTAMP\(6\)"), _NOW),
+    (re.compile(r"\bCREATE INDEX (?!IF NOT EXISTS)"),
+     "CREATE INDEX IF NOT EXISTS "),
+]
+
+_ON_UPDATE = re.compile(
+    r"CREATE TABLE IF NOT EXISTS (\w+).*?(\w+) TIMESTAMP\(6\)[^,]*?"
+    r"ON UPDATE CURRENT_TIMESTAMP\(6\)", re.DOTALL)
+
+
+_ADD_TIMESTAMP_COLUMN = re.compile(
+    r"ALTER TABLE (\w+) ADD COLUMN (\w+) TIMESTAMP\(6\)[^,]*?"
+    r"DEFAULT CURRENT_TIMESTAMP\(6\)(.*)", re.DOTALL)
+
+# sqlite error messages -> the mysql.connector errno callers check for
+_ERRNOS = [
+    ("duplicate column name", 1060),  # ER_DUP_FIELDNAME
+]
+
+
+def _translate(query):
+    """Rewrite the MySQL-only bits of a query for sqlite"""
+    query = query.replace("%s", "?")
+    for pattern, replacement in _REWRITES:
+        query = pattern.sub(replacement, query)
+    return query
+
+
+def _on_update_trigger(query):
+    """
+    sqlite has no ON UPDATE CURRENT_TIMESTAMP: return a trigger emulating
+    it for the table a CREATE TABLE query defines (or None)
+    """
+    match = _ON_UPDATE.search(query)
+    if match is None:
+        return None
+    table, column = match.groups()
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS {table}_{column}_on_update "
+        f"AFTER UPDATE ON {table} FOR EACH ROW "
+        f"WHEN NEW.{column} IS OLD.{column} BEGIN "
+        f"UPDATE {table} SET {column} = {_NOW} WHERE rowid = NEW.rowid; END"
+    )
+
+
+def _add_timestamp_column(query):
+    """
+    sqlite cannot add a column whose default is the current time: return
+    the statements that emulate such an ALTER TABLE (a plain column
+    filled in for existing rows, and triggers setting it on insert and,
+    with ON UPDATE, on update), or None for any other query
+    """
+    match = _ADD_TIMESTAMP_COLUMN.search(query)
+    if match is None:
+        return None
+    table, column, rest = match.groups()
+    statements = [
+        f"ALTER TABLE {table} ADD COLUMN {column} TIMESTAMP",
+        f"UPDATE {table} SET {column} = {_NOW}",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_{column}_on_insert "
+        f"AFTER INSERT ON {table} FOR EACH ROW "
+        f"WHEN NEW.{column} IS NULL BEGIN "
+        f"UPDATE {table} SET {column} = {_NOW} WHERE rowid = NEW.rowid; END",
+    ]
+    if "ON UPDATE CURRENT_TIMESTAMP" in rest:
+        statements.append(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_{column}_on_update "
+            f"AFTER UPDATE ON {table} FOR EACH ROW "
+            f"WHEN NEW.{column} IS OLD.{column} BEGIN "
+            f"UPDATE {table} SET {column} = {_NOW} "
+            f"WHERE rowid = NEW.rowid; END")
+    return statements
+
+
+def _error(e):
+    """mysql.connector.Error for a sqlite3 error, with a known errno"""
+    message = str(e)
+    for marker, errno in _ERRNOS:
+        if marker in message:
+            return Error(msg=message, errno=errno)
+    return Error(msg=message)
+
+
+class StandinCursor:
+    """Cursor with the mysql.connector surface (dictionary rows, %s params)"""
+
+    def __init__(self, connection, dictionary=False, latency=0.0):
+        self._cursor = connection.cursor()
+        self.dictionary = dictionary
+        self.latency = latency
+
+    def _round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _row(self, row):
+        if row is None or not self.dictionary:
+            return row
+        columns = [col[0] for col in self._cursor.description]
+        return dict(zip(columns, row))
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, query, params=()):
+        self._round_trip()
+        try:
+            emulated = _add_timestamp_column(query)
+            if emulated:
+                for statement in emulated:
+                    self._cursor.execute(statement)
+                return
+            self._cursor.execute(_translate(query), params)
+            trigger = _on_update_trigger(query)
+            if trigger:
+                self._cursor.execute(trigger)
+        except sqlite3.Error as e:
+            raise _error(e) from e
+
+    def executemany(self, query, seq_params):
+        self._round_trip()
+        try:
+            self._cursor.executemany(_translate(query), seq_params)
+        except sqlite3.Error as e:
+            raise _error(e) from e
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        self._round_trip()
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        self._round_trip()
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        for row in self._cursor:
+            yield self._row(row)
+
+    def close(self):
+        self._cursor.close()
+
+
+class StandinConnection:
+    """
+    Connection with the mysql.connector surface used in this project.
+    latency seconds are slept on every execute and fetch call to imitate
+    the round trip to a database server.
+    """
+
+    def __init__(self, path=":memory:", latency=0.0):
+        self.path = path
+        self.latency = latency
+        self._conn = sqlite3.connect(
+            path,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+            timeout=60
+        )
+
+    def cursor(self, dictionary=False, buffered=None):
+        return StandinCursor(self._conn, dictionary=dictionary,
+                             latency=self.latency)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def is_connected(self):
+        try:
+            self._conn.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close(self):
+        self._conn.close()
+
+
+def connect(path=":memory:", latency=0.0):
+    """Open a stand-in connection to the sqlite file at path"""
+    return StandinConnection(path, latency)